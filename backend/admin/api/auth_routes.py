@@ -88,12 +88,10 @@ def admin_logout():
             return jsonify({'error': 'Admin access required'}), 403
             
         # Import app components
-        from app import jwt_blacklist, jwt_blacklist_lock
+        from app import revoke_jti
         
         # Add token to blacklist for secure logout
-        jti = claims['jti']
-        with jwt_blacklist_lock:
-            jwt_blacklist.add(jti)
+        revoke_jti(claims['jti'], claims['exp'])
         
         return jsonify({
             'success': True,
@@ -216,6 +216,7 @@ def admin_update_student(student_id):
         
         # Import app components
         from app import app, Student, db
+        from mobile_api import invalidate_student_section
         
         with app.app_context():
             student = Student.query.get(student_id)
@@ -268,6 +269,7 @@ def admin_update_student(student_id):
             
             student.updated_at = datetime.utcnow()
             db.session.commit()
+            invalidate_student_section(student_id)
             
             return jsonify({
                 'success': True,
@@ -304,6 +306,7 @@ def admin_delete_student_permanent(student_id):
         
         # Import app components
         from app import app, Student, StudentClassEnrollment, db
+        from mobile_api import invalidate_student_section
         
         with app.app_context():
             student = Student.query.get(student_id)
@@ -317,6 +320,7 @@ def admin_delete_student_permanent(student_id):
             
             db.session.delete(student)
             db.session.commit()
+            invalidate_student_section(student_id)
             
             return jsonify({
                 'success': True,
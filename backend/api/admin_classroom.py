@@ -31,6 +31,7 @@ from utils.audit_helpers import (
     create_audit_details,
     sanitize_audit_data
 )
+from mobile_api import invalidate_classroom_wifi_networks
 
 # Import geofencing service
 try:
@@ -242,6 +243,9 @@ def register_classroom():
             # Commit transaction
             db.session.commit()
             
+            if wifi_id is not None:
+                invalidate_classroom_wifi_networks(classroom_id)
+            
             # Prepare response
             response_data = {
                 'classroom_id': classroom_id,
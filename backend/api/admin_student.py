@@ -29,6 +29,7 @@ from utils.audit_helpers import (
     create_audit_details,
     sanitize_audit_data
 )
+from mobile_api import invalidate_student_section
 
 # Create Blueprint
 admin_student_bp = Blueprint('admin_student', __name__, url_prefix='/api/admin/students')
@@ -575,6 +576,7 @@ def update_student(student_id):
             )
             
             db.session.commit()
+            invalidate_student_section(student_id)
             
             return jsonify({
                 'success': True,
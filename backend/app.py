@@ -15,6 +15,7 @@ from datetime import datetime, timedelta, time
 from flask import Flask, request, jsonify, render_template, session, redirect, url_for, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
+from sqlalchemy.orm import validates
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
 from flask_limiter import Limiter
@@ -51,8 +52,6 @@ try:
 except ImportError:
     PYZBAR_AVAILABLE = False
     print("⚠️  pyzbar not available - QR decoding features disabled")
-import random
-import string
 import time
 import threading
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -63,6 +62,7 @@ import logging.handlers
 
 # Import configuration
 from config import config
+from validators import normalize_mac_address, validate_bssid
 
 # Initialize logging
 logging.basicConfig(
@@ -89,24 +89,173 @@ admin_bp = None
 config_name = os.environ.get('FLASK_CONFIG', 'development')
 app.config.from_object(config[config_name])
 
+# Encode/decode JSON with orjson when it is installed
+from utils.json_provider import OrjsonProvider, orjson
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
 # OTP Configuration
 app.config['OTP_LENGTH'] = int(os.environ.get('OTP_LENGTH', 6))
 app.config['OTP_EXPIRY_MINUTES'] = int(os.environ.get('OTP_EXPIRY_MINUTES', 5))
 
 # JWT Token Blacklist for secure logout
+# In-process fallback used only when Redis is not configured
 jwt_blacklist = set()
 jwt_blacklist_lock = threading.Lock()
 
+# Shared Redis client (token revocation, caches) - None when REDIS_URL is not set
+from utils.cache import redis_client
+
+REVOKED_JTI_KEY = 'auth:revoked:{}'
+
 # Initialize extensions
 db = SQLAlchemy(app)
+
+# Development/testing guard against per-request query-count regressions
+if app.config.get('QUERY_COUNT_CHECK'):
+    from utils.query_counter import install_query_counter
+    install_query_counter(app)
 cors = CORS(app, origins=app.config['CORS_ORIGINS'])
-jwt = JWTManager(app)
+class CachingJWTManager(JWTManager):
+    """
+    JWTManager that remembers decoded claims per raw token for a short window,
+    so polling clients reusing one bearer token skip repeated signature checks.
+    Blocklist and token-version callbacks still run on every request.
+    """
+    DECODE_CACHE_SECONDS = 30
+    DECODE_CACHE_MAX_ENTRIES = 4096
+
+    def __init__(self, flask_app=None):
+        self._decode_cache = {}  # sha256(token) -> (claims, cached_until monotonic)
+        self._decode_cache_lock = threading.Lock()
+        super().__init__(flask_app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if allow_expired or csrf_value is not None:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = hashlib.sha256(encoded_token.encode()).hexdigest()
+        now = time.monotonic()
+        with self._decode_cache_lock:
+            entry = self._decode_cache.get(key)
+        if entry is not None and entry[1] > now:
+            claims = entry[0]
+            if 'exp' not in claims or claims['exp'] > time.time():
+                return dict(claims)
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        with self._decode_cache_lock:
+            if len(self._decode_cache) >= self.DECODE_CACHE_MAX_ENTRIES:
+                expired = [k for k, v in self._decode_cache.items() if v[1] <= now]
+                for k in expired:
+                    del self._decode_cache[k]
+                if len(self._decode_cache) >= self.DECODE_CACHE_MAX_ENTRIES:
+                    self._decode_cache.clear()
+            self._decode_cache[key] = (claims, now + self.DECODE_CACHE_SECONDS)
+        return dict(claims)
+
+jwt = CachingJWTManager(app)
+
+def revoke_jti(jti, exp_ts):
+    """Revoke a token by jti until its own expiry timestamp"""
+    if redis_client is not None:
+        try:
+            redis_client.set(REVOKED_JTI_KEY.format(jti), '1', ex=max(1, int(exp_ts) - int(time.time())))
+            return
+        except Exception as e:
+            logger.error(f"Redis revocation failed, falling back to in-process blacklist: {e}")
+    with jwt_blacklist_lock:
+        jwt_blacklist.add(jti)
+
+# Student token versions - bumping the version revokes every token minted before it
+TOKEN_VERSION_KEY = 'auth:token_version:{}'
+TOKEN_VERSION_CACHE_SECONDS = 60
+_token_version_cache = {}  # student_id -> (token_version, monotonic timestamp)
+_token_version_cache_lock = threading.Lock()
+
+def build_student_claims(student):
+    """Build the additional JWT claims for a student token"""
+    return {
+        'type': 'student',
+        'student_id': student.student_id,
+        'email': student.email,
+        'tv': student.token_version or 0
+    }
+
+def build_faculty_claims(faculty):
+    """Build the additional JWT claims for a faculty token (is_active is checked from the token)"""
+    return {
+        'type': 'faculty',
+        'faculty_id': faculty.faculty_id,
+        'is_active': bool(faculty.is_active)
+    }
+
+def get_student_token_version(student_id):
+    """Get a student's current token version (cached for TOKEN_VERSION_CACHE_SECONDS)"""
+    key = TOKEN_VERSION_KEY.format(student_id)
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(key)
+            if cached is not None:
+                return int(cached)
+        except Exception as e:
+            logger.error(f"Redis token version lookup failed: {e}")
+    else:
+        with _token_version_cache_lock:
+            entry = _token_version_cache.get(student_id)
+        if entry and time.monotonic() - entry[1] < TOKEN_VERSION_CACHE_SECONDS:
+            return entry[0]
+    
+    version = db.session.execute(
+        text("SELECT token_version FROM students WHERE student_id = :student_id"),
+        {'student_id': student_id}
+    ).scalar()
+    version = version or 0
+    
+    if redis_client is not None:
+        try:
+            redis_client.set(key, version, ex=TOKEN_VERSION_CACHE_SECONDS)
+        except Exception as e:
+            logger.error(f"Redis token version store failed: {e}")
+    else:
+        with _token_version_cache_lock:
+            _token_version_cache[student_id] = (version, time.monotonic())
+    return version
+
+def bump_student_token_version(student_id):
+    """Invalidate all outstanding tokens for a student (logout from every device)"""
+    db.session.execute(
+        text("UPDATE students SET token_version = token_version + 1 WHERE student_id = :student_id"),
+        {'student_id': student_id}
+    )
+    db.session.commit()
+    
+    if redis_client is not None:
+        try:
+            redis_client.delete(TOKEN_VERSION_KEY.format(student_id))
+        except Exception as e:
+            logger.error(f"Redis token version invalidation failed: {e}")
+    with _token_version_cache_lock:
+        _token_version_cache.pop(student_id, None)
+
+@jwt.token_verification_loader
+def check_token_version(jwt_header, jwt_payload):
+    """Reject student tokens minted before the student's latest logout-all"""
+    if jwt_payload.get('type') != 'student' or 'tv' not in jwt_payload:
+        return True
+    return jwt_payload['tv'] == get_student_token_version(jwt_payload.get('student_id'))
 
 # JWT Blacklist handler for token revocation
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload):
     """Check if token has been revoked (blacklisted)"""
     jti = jwt_payload['jti']
+    if redis_client is not None:
+        try:
+            if redis_client.exists(REVOKED_JTI_KEY.format(jti)):
+                return True
+        except Exception as e:
+            logger.error(f"Redis revocation check failed: {e}")
     with jwt_blacklist_lock:
         return jti in jwt_blacklist
 
@@ -181,6 +330,7 @@ class Student(db.Model):
     program = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0)  # Bumped on logout-all
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -278,6 +428,14 @@ class StudentDevices(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_student_device_uuid', 'student_id', 'device_uuid'),
+        db.Index('idx_student_last_seen', 'student_id', 'last_seen'),
+    )
+    
+    # Relationships
+    student = db.relationship('Student', backref=db.backref('devices', lazy=True))
+    
     def __init__(self, student_id, device_uuid, device_type, device_name=None, device_model=None, 
                  os_version=None, app_version=None, fcm_token=None, is_active=True, 
                  biometric_enabled=False, location_permission=False, bluetooth_permission=False):
@@ -314,6 +472,10 @@ class AttendanceSession(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_class_session_date', 'class_id', 'session_date'),
+    )
+    
     def __init__(self, class_id, faculty_id, qr_token, qr_secret_key, qr_expires_at, otp_used=None, status='active'):
         self.class_id = class_id
         self.faculty_id = faculty_id
@@ -344,6 +506,11 @@ class AttendanceRecord(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Covering index for per-student history and monthly overview range scans
+    __table_args__ = (
+        db.Index('idx_student_scan_status', 'student_id', 'scan_timestamp', 'status'),
+    )
+    
     def __init__(self, session_id, student_id, biometric_verified=False, location_verified=False, 
                  bluetooth_verified=False, gps_latitude=None, gps_longitude=None, gps_accuracy=None,
                  bluetooth_rssi=None, device_info=None, verification_score=0.00, status='present', notes=None):
@@ -452,6 +619,12 @@ class WiFiNetwork(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Covers the classroom network listing (no row lookup) and BSSID point checks
+        db.Index('idx_wifi_classroom_active_bssid', 'classroom_id', 'is_active', 'bssid', 'ssid', 'security_type'),
+        db.Index('idx_wifi_classroom_active_ssid', 'classroom_id', 'is_active', 'ssid'),
+    )
+    
     # Relationships
     classroom = db.relationship('Classroom', backref=db.backref('wifi_networks', lazy=True))
     
@@ -462,6 +635,16 @@ class WiFiNetwork(db.Model):
         self.security_type = security_type
         self.registered_by = registered_by
         self.is_active = is_active
+    
+    @validates('bssid')
+    def _normalize_bssid(self, key, bssid):
+        """Store BSSIDs in canonical XX:XX:XX:XX:XX:XX form so lookups compare as-is"""
+        if not bssid:
+            return bssid
+        is_valid, error = validate_bssid(bssid)
+        if not is_valid:
+            raise ValueError(error)
+        return normalize_mac_address(bssid)
 
 class BluetoothBeacon(db.Model):
     """Bluetooth beacon information for classrooms"""
@@ -778,7 +961,7 @@ def get_first_active_faculty():
 
 def generate_otp(length=6):
     """Generate a random OTP"""
-    return ''.join(random.choices(string.digits, k=length))
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
 
 def generate_token(length=32):
     """Generate a secure random token"""
@@ -1029,7 +1212,7 @@ def faculty_login():
         faculty = Faculty.query.filter_by(email=email, is_active=True).first()
         
         if faculty and check_password(password, faculty.password_hash):
-            claims = {'type': 'faculty', 'faculty_id': faculty.faculty_id}
+            claims = build_faculty_claims(faculty)
             access_token = create_access_token(
                 identity=str(faculty.faculty_id),
                 additional_claims=claims
@@ -1120,7 +1303,7 @@ def student_login():
             logger.debug(f"Password check result: {password_check}")
             
             if password_check:
-                claims = {'type': 'student', 'student_id': student.student_id}
+                claims = build_student_claims(student)
                 access_token = create_access_token(
                     identity=str(student.student_id),
                     additional_claims=claims
@@ -1198,6 +1381,8 @@ def refresh_access_token():
             additional_claims['student_id'] = id_int
         elif user_type == 'faculty' and id_int is not None:
             additional_claims['faculty_id'] = id_int
+            if 'is_active' in claims:
+                additional_claims['is_active'] = claims['is_active']
         elif user_type == 'admin' and id_int is not None:
             additional_claims['admin_id'] = id_int
 
@@ -1270,7 +1455,7 @@ def student_register():
         logger.info(f"Student registered successfully: {student.email}")
         
         # Create tokens for auto-login
-        claims = {'type': 'student', 'student_id': student.student_id}
+        claims = build_student_claims(student)
         access_token = create_access_token(
             identity=str(student.student_id),
             additional_claims=claims
@@ -2837,9 +3022,7 @@ def logout():
         claims = get_jwt()
         
         # Add token to blacklist for secure logout
-        jti = claims['jti']
-        with jwt_blacklist_lock:
-            jwt_blacklist.add(jti)
+        revoke_jti(claims['jti'], claims['exp'])
         
         # Stop all active QR sessions
         with active_qr_sessions_lock:
@@ -3653,7 +3836,7 @@ def student_mobile_login():
         if student and check_password(password, student.password_hash):
             access_token = create_access_token(
                 identity=str(student.student_id),
-                additional_claims={'type': 'student', 'student_id': student.student_id}
+                additional_claims=build_student_claims(student)
             )
             
             # Multiple response formats for better mobile app compatibility
@@ -3848,7 +4031,7 @@ def mobile_v2_login():
             password_match = check_password(password, student.password_hash)
             logger.info(f"Password check result: {password_match}")
             if password_match:
-                claims = {'type': 'student', 'student_id': student.student_id}
+                claims = build_student_claims(student)
                 access_token = create_access_token(
                     identity=str(student.student_id),
                     additional_claims=claims
@@ -11,17 +11,22 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'dev-jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     CORS_ORIGINS = ['http://localhost:5002', 'http://127.0.0.1:5002']
+    # Hard cap on request bodies, enforced by Werkzeug even without a Content-Length (chunked uploads)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
     
     # Use SQLite for development
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///intelliattend.db'
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    # Flag views that exceed their declared per-request SQL query budget
+    QUERY_COUNT_CHECK = True
     # Use SQLite for development
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL') or 'sqlite:///intelliattend_dev.db'
 
 class TestingConfig(Config):
     TESTING = True
+    QUERY_COUNT_CHECK = True
     # Use SQLite for testing
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///intelliattend_test.db'
 
@@ -29,6 +34,15 @@ class ProductionConfig(Config):
     # Use MySQL for production
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f"mysql+pymysql://{os.environ.get('MYSQL_USER', 'root')}:{os.environ.get('MYSQL_PASSWORD', '')}@{os.environ.get('MYSQL_HOST', 'localhost')}:{os.environ.get('MYSQL_PORT', 3306)}/{os.environ.get('MYSQL_DB', 'intelliattend_db')}"
+    
+    # Connection pool sized for concurrent mobile API traffic; recycle before
+    # MySQL's wait_timeout and pre-ping so stale connections are replaced
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 25)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 25)),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    }
 
 config = {
     'development': DevelopmentConfig,
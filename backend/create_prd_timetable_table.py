@@ -36,7 +36,8 @@ def create_prd_timetable_table():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (section_id) REFERENCES sections(id),
                 FOREIGN KEY (subject_code) REFERENCES subjects(subject_code),
-                UNIQUE KEY unique_slot (section_id, day_of_week, slot_number)
+                UNIQUE KEY unique_slot (section_id, day_of_week, slot_number),
+                INDEX idx_section_day_start (section_id, day_of_week, start_time)
             );
             """
             
@@ -0,0 +1,9 @@
+-- ============================================================================
+-- IntelliAttend - Attendance Session Composite Index
+-- Per-class session listings filter by class and range/order by date
+-- ============================================================================
+
+CREATE INDEX idx_class_session_date ON attendance_sessions (class_id, session_date);
+
+-- Refresh optimizer statistics
+ANALYZE TABLE attendance_sessions;
@@ -0,0 +1,9 @@
+-- ============================================================================
+-- IntelliAttend - Faculty Full Name Column
+-- Stored generated column so reports can select one display name instead of
+-- concatenating first_name/last_name per row
+-- ============================================================================
+
+ALTER TABLE faculty
+    ADD COLUMN full_name VARCHAR(101)
+    GENERATED ALWAYS AS (TRIM(CONCAT_WS(' ', first_name, last_name))) STORED;
@@ -0,0 +1,7 @@
+-- ============================================================================
+-- IntelliAttend - Hierarchy Unique Keys
+-- One timetable per branch/year/semester, so seed scripts can upsert it
+-- ============================================================================
+
+ALTER TABLE timetables
+    ADD UNIQUE KEY unique_branch_year_semester (branch_id, academic_year, semester);
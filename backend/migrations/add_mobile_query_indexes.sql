@@ -0,0 +1,11 @@
+-- ============================================================================
+-- IntelliAttend - Mobile API Query Indexes
+-- Composite indexes for the timetable and attendance history hot paths
+-- ============================================================================
+
+-- Timetable lookups filter by section + day and order by start time
+CREATE INDEX idx_section_day_start ON timetable (section_id, day_of_week, start_time);
+
+-- Per-student attendance range scans; including status makes the
+-- monthly overview aggregate index-only
+CREATE INDEX idx_student_scan_status ON attendance_records (student_id, scan_timestamp, status);
@@ -0,0 +1,10 @@
+-- ============================================================================
+-- IntelliAttend - Student Device Composite Indexes
+-- Support the heartbeat/connectivity updates and the presence aggregates
+-- ============================================================================
+
+-- Heartbeat, connectivity and data-collect updates match on student + device
+CREATE INDEX idx_student_device_uuid ON student_devices (student_id, device_uuid);
+
+-- Presence endpoints take MAX(last_seen) per student
+CREATE INDEX idx_student_last_seen ON student_devices (student_id, last_seen);
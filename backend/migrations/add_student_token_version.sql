@@ -0,0 +1,7 @@
+-- ============================================================================
+-- IntelliAttend - Student Token Version
+-- Incrementing token_version revokes every JWT issued to the student
+-- ============================================================================
+
+ALTER TABLE students
+    ADD COLUMN token_version INT NOT NULL DEFAULT 0 COMMENT 'Bumped on logout from all devices';
@@ -0,0 +1,11 @@
+-- ============================================================================
+-- IntelliAttend - Wi-Fi Network Composite Indexes
+-- Support classroom Wi-Fi validation during attendance scans
+-- ============================================================================
+
+-- Active networks for a classroom; trailing columns make the
+-- ssid/bssid/security_type listing an index-only read
+CREATE INDEX idx_wifi_classroom_active_bssid ON wifi_networks (classroom_id, is_active, bssid, ssid, security_type);
+
+-- SSID fallback match within a classroom
+CREATE INDEX idx_wifi_classroom_active_ssid ON wifi_networks (classroom_id, is_active, ssid);
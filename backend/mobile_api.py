@@ -5,11 +5,30 @@ Handles communication between mobile application and server
 """
 
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token, get_jwt
-from sqlalchemy import text
+from flask_jwt_extended import jwt_required, create_access_token, get_jwt
+from sqlalchemy import text, select, insert, func, case, lambda_stmt, bindparam, event, inspect
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
+import atexit
+import hashlib
 import json
 import logging
+import queue
+import secrets
+import threading
+import time
+from functools import wraps
+
+# Models are imported once at module load; this module is imported by app.py
+# after all models are defined, so there is no circular-import problem
+from app import (
+    Student, Faculty, StudentDevices, AttendanceRecord, AttendanceSession, Classes,
+    Classroom, SecurityViolation, WiFiNetwork, check_password, db,
+    build_student_claims, build_faculty_claims, revoke_jti, bump_student_token_version
+)
+from validators import parse_device_info, normalize_mac_address, validate_bssid
+from utils.cache import cache_get_json, cache_set_json, cache_delete
+from utils.query_counter import query_budget
 
 # Create blueprint for mobile API
 mobile_bp = Blueprint('mobile', __name__, url_prefix='/api/mobile')
@@ -17,6 +36,365 @@ mobile_bp = Blueprint('mobile', __name__, url_prefix='/api/mobile')
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def student_required(fn):
+    """
+    Reject non-student tokens with 403 and pass the token's student_id to the view;
+    apply below @jwt_required() so the token has already been verified
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        claims = get_jwt()
+        if claims.get('type') != 'student':
+            return jsonify({'error': 'Student access required'}), 403
+        return fn(*args, student_id=claims['student_id'], **kwargs)
+    return wrapper
+
+def faculty_or_admin_required(fn):
+    """
+    Reject tokens that are not faculty/admin with 403; apply below @jwt_required().
+    Faculty activity comes from the token's is_active claim, so no Faculty lookup is needed.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        claims = get_jwt()
+        user_type = claims.get('type')
+        if user_type not in ('faculty', 'admin'):
+            return jsonify({'error': 'Access denied'}), 403
+        if user_type == 'faculty' and claims.get('is_active') is False:
+            return jsonify({'error': 'Faculty account inactive'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+# A device counts as online if it was seen within this window
+ONLINE_WINDOW = timedelta(seconds=300)
+
+# Recent device/connect payloads, used to skip redundant reconnect writes
+# device_uuid -> (fingerprint, response_data, monotonic timestamp)
+DEVICE_ECHO_TTL_SECONDS = 30
+DEVICE_ECHO_MAX_ENTRIES = 100000
+_device_echo = {}
+_device_echo_lock = threading.Lock()
+
+def _get_device_echo(device_uuid, fingerprint):
+    """Return the cached reconnect response if the same payload was seen recently"""
+    with _device_echo_lock:
+        entry = _device_echo.get(device_uuid)
+    if entry and entry[0] == fingerprint and time.monotonic() - entry[2] < DEVICE_ECHO_TTL_SECONDS:
+        return entry[1]
+    return None
+
+def _remember_device_echo(device_uuid, fingerprint, response_data):
+    """Record a reconnect payload, pruning expired entries when the cache is full"""
+    now = time.monotonic()
+    with _device_echo_lock:
+        if len(_device_echo) >= DEVICE_ECHO_MAX_ENTRIES:
+            expired = [k for k, v in _device_echo.items() if now - v[2] >= DEVICE_ECHO_TTL_SECONDS]
+            for k in expired:
+                del _device_echo[k]
+            if len(_device_echo) >= DEVICE_ECHO_MAX_ENTRIES:
+                _device_echo.clear()
+        _device_echo[device_uuid] = (fingerprint, response_data, now)
+
+def forget_device_echo(device_uuid):
+    """Drop a cached reconnect response (its is_registered/student_email are now stale)"""
+    with _device_echo_lock:
+        _device_echo.pop(device_uuid, None)
+
+@event.listens_for(StudentDevices, 'after_insert')
+def _forget_device_echo_on_insert(mapper, connection, target):
+    forget_device_echo(target.device_uuid)
+
+@event.listens_for(StudentDevices, 'after_delete')
+def _forget_device_state_on_delete(mapper, connection, target):
+    forget_device_echo(target.device_uuid)
+    forget_heartbeat_write(target.student_id, target.device_uuid)
+
+@event.listens_for(StudentDevices, 'after_update')
+def _forget_device_state_on_rebind(mapper, connection, target):
+    # Any ORM path that binds/unbinds or (de)activates a device (login, registration,
+    # admin) lands here; the old owner's debounced heartbeats must hit the DB again
+    state = inspect(target)
+    owner_history = state.attrs.student_id.history
+    if owner_history.has_changes():
+        forget_device_echo(target.device_uuid)
+        for owner_id in (*owner_history.deleted, *owner_history.added):
+            forget_heartbeat_write(owner_id, target.device_uuid)
+    elif state.attrs.is_active.history.has_changes():
+        forget_heartbeat_write(target.student_id, target.device_uuid)
+
+# Upper bound for mobile request bodies (sensor uploads included)
+MAX_MOBILE_PAYLOAD_BYTES = 1024 * 1024
+
+@mobile_bp.before_request
+def reject_malformed_payloads():
+    """
+    Reject oversized or non-JSON POST bodies before they are buffered and parsed
+    Bodyless POSTs (e.g. logout) are allowed through
+    """
+    if request.method != 'POST':
+        return None
+    
+    is_streamed = request.content_length is None and 'Transfer-Encoding' in request.headers
+    if not request.content_length and not is_streamed:
+        return None
+    
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 415
+    
+    if is_streamed:
+        # No length to check up front: buffer the body here (Werkzeug aborts with 413
+        # past MAX_CONTENT_LENGTH) so get_json() in the view reuses the cached bytes
+        body_length = len(request.get_data(cache=True))
+    else:
+        body_length = request.content_length
+    
+    if body_length > MAX_MOBILE_PAYLOAD_BYTES:
+        return jsonify({'error': 'Payload too large'}), 413
+    
+    return None
+
+@mobile_bp.errorhandler(413)
+def payload_too_large(error):
+    """JSON body for bodies rejected by MAX_CONTENT_LENGTH"""
+    return jsonify({'error': 'Payload too large'}), 413
+
+# Hot-path statements are built once at import so SQLAlchemy's compiled cache
+# is keyed on a stable statement instead of a fresh text() per request
+Q_STUDENT_SECTION = text("""
+    SELECT s.student_code, s.first_name, s.last_name, sec.id AS section_id,
+           sec.section_name, sec.course, sec.room_number
+    FROM students s
+    JOIN sections sec ON s.section_id = sec.id
+    WHERE s.student_id = :student_id
+""")
+
+Q_SECTION_DAY_TIMETABLE = text("""
+    SELECT t.id, t.slot_number, t.slot_type, t.start_time, t.end_time, t.subject_code,
+           s.subject_name, s.short_name, s.faculty_name, t.room_number
+    FROM timetable t
+    LEFT JOIN subjects s ON t.subject_code = s.subject_code
+    WHERE t.section_id = :section_id 
+    AND t.day_of_week = :day_of_week
+    AND t.slot_type NOT IN ('break', 'lunch', 'free')
+    AND t.subject_code IS NOT NULL 
+    AND t.subject_code != ''
+    ORDER BY t.slot_number, t.start_time
+""")
+
+Q_STUDENT_TIMETABLE = text("""
+    SELECT t.day_of_week, t.slot_number, t.start_time, t.end_time, t.subject_code, 
+           t.slot_type, t.room_number, sub.subject_name, sub.short_name, sub.faculty_name
+    FROM timetable t
+    LEFT JOIN subjects sub ON t.subject_code = sub.subject_code
+    WHERE t.section_id = :section_id
+    AND t.slot_type NOT IN ('break', 'lunch', 'free')
+    AND t.subject_code IS NOT NULL
+    AND t.subject_code != ''
+    ORDER BY FIELD(t.day_of_week, 'MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY'), 
+             t.slot_number, t.start_time
+""")
+
+Q_ATTENDANCE_SUMMARY = text("""
+    SELECT 
+        s.subject_code,
+        s.subject_name,
+        s.short_name,
+        f.full_name AS faculty_name,
+        ast.total_sessions,
+        ast.attended_sessions,
+        ast.attendance_percentage
+    FROM attendance_statistics ast
+    JOIN subjects s ON ast.subject_id = s.id
+    LEFT JOIN faculty f ON s.faculty_id = f.faculty_id
+    WHERE ast.student_id = :student_id AND ast.subject_id IS NOT NULL
+    ORDER BY ast.total_sessions DESC, s.subject_name
+""")
+
+Q_MONTHLY_WEEKS = text("""
+    SELECT FLOOR(DATEDIFF(DATE(scan_timestamp), :start_of_month) / 7) + 1 AS week_num,
+           COUNT(*) AS total,
+           SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) AS present
+    FROM attendance_records
+    WHERE student_id = :student_id
+    AND scan_timestamp >= :start_of_month
+    AND scan_timestamp < :end_of_range
+    GROUP BY week_num
+""")
+
+def _build_history_query(has_from, has_to):
+    """Build the attendance history statement for one combination of date filters"""
+    query_parts = [
+        "SELECT",
+        "  ah.record_id,",
+        "  ah.session_id,",
+        "  s.subject_code,",
+        "  s.subject_name,",
+        "  f.first_name,",
+        "  f.last_name,",
+        "  ah.status,",
+        "  ah.verification_score,",
+        "  ah.scan_timestamp",
+        "FROM attendance_records ah",
+        "JOIN students st ON ah.student_id = st.student_id",
+        "JOIN timetable t ON ah.session_id = t.id",
+        "JOIN subjects s ON t.subject_code = s.subject_code",
+        "LEFT JOIN faculty f ON s.faculty_id = f.faculty_id",
+        "WHERE ah.student_id = :student_id"
+    ]
+    if has_from:
+        query_parts.append("AND DATE(ah.scan_timestamp) >= :from_date")
+    if has_to:
+        query_parts.append("AND DATE(ah.scan_timestamp) <= :to_date")
+    query_parts.append("ORDER BY ah.scan_timestamp DESC")
+    query_parts.append("LIMIT :limit")
+    return text(" ".join(query_parts))
+
+# (has_from, has_to) -> prebuilt statement
+Q_ATTENDANCE_HISTORY = {
+    (has_from, has_to): _build_history_query(has_from, has_to)
+    for has_from in (False, True) for has_to in (False, True)
+}
+
+Q_SESSION_STATUS = select(
+    AttendanceSession.status, AttendanceSession.qr_expires_at,
+    Classes.class_name, Classes.class_code
+).outerjoin(
+    Classes, Classes.class_id == AttendanceSession.class_id
+).where(AttendanceSession.session_id == bindparam('session_id'))
+
+Q_SESSION_CLASSROOM = select(
+    AttendanceSession.session_id, Classes.class_id,
+    Classes.classroom_id.label('class_classroom_id'), Classroom.classroom_id
+).outerjoin(
+    Classes, Classes.class_id == AttendanceSession.class_id
+).outerjoin(
+    Classroom, Classroom.classroom_id == Classes.classroom_id
+).where(AttendanceSession.session_id == bindparam('session_id'))
+
+Q_CLASSROOM_WIFI_NETWORKS = select(
+    WiFiNetwork.ssid, WiFiNetwork.bssid, WiFiNetwork.security_type
+).where(
+    WiFiNetwork.classroom_id == bindparam('classroom_id'),
+    WiFiNetwork.is_active.is_(True)
+)
+
+def find_device_by_uuid(device_uuid):
+    """Look up a device by UUID (lambda_stmt caches the compiled SELECT)"""
+    stmt = lambda_stmt(lambda: select(StudentDevices).where(StudentDevices.device_uuid == device_uuid))
+    return db.session.execute(stmt).scalars().first()
+
+def update_student_device(student_id, device_uuid, values):
+    """
+    Update columns on a device owned by the given student without loading the row.
+    The ownership check is part of the WHERE clause; returns the number of rows matched.
+    """
+    return StudentDevices.query.filter_by(
+        student_id=student_id, device_uuid=device_uuid
+    ).update(values, synchronize_session=False)
+
+# Student -> section profile rarely changes (once per semester), so it is cached
+STUDENT_SECTION_CACHE_SECONDS = 3600
+STUDENT_SECTION_KEY = 'stu:{}'
+
+def get_student_section(student_id):
+    """
+    Get the student's section profile, cached for STUDENT_SECTION_CACHE_SECONDS
+    Returns None if the student (or their section) does not exist
+    """
+    key = STUDENT_SECTION_KEY.format(student_id)
+    profile = cache_get_json(key)
+    if profile is not None:
+        return profile
+    
+    row = db.session.execute(Q_STUDENT_SECTION, {'student_id': student_id}).mappings().first()
+    
+    if row is None:
+        return None
+    
+    profile = dict(row)
+    cache_set_json(key, profile, STUDENT_SECTION_CACHE_SECONDS)
+    return profile
+
+def invalidate_student_section(student_id):
+    """Drop the cached section profile after a student record changes"""
+    cache_delete(STUDENT_SECTION_KEY.format(student_id))
+
+# Registered classroom WiFi networks change on the order of days; every attendance
+# scan validates against them, so the active set is cached per classroom
+CLASSROOM_WIFI_CACHE_SECONDS = 300
+CLASSROOM_WIFI_KEY = 'wifi:idx:{}'
+
+def get_classroom_wifi_networks(classroom_id):
+    """
+    Get the classroom's active WiFi networks, cached for CLASSROOM_WIFI_CACHE_SECONDS.
+    Returned as lookup indexes so validation never scans the list:
+    {'by_bssid': {bssid: network}, 'by_ssid': {ssid: network}, 'count': n, 'etag': ...}
+    where each network is a {ssid, bssid, security_type} dict and etag changes
+    whenever the active set does
+    """
+    key = CLASSROOM_WIFI_KEY.format(classroom_id)
+    networks = cache_get_json(key)
+    if networks is not None:
+        return networks
+    
+    result = db.session.execute(Q_CLASSROOM_WIFI_NETWORKS, {'classroom_id': classroom_id})
+    by_bssid, by_ssid, count = {}, {}, 0
+    for row in result.mappings():
+        network = dict(row)
+        count += 1
+        if network['bssid']:
+            by_bssid[network['bssid']] = network
+        if network['ssid']:
+            by_ssid.setdefault(network['ssid'], network)
+    
+    etag = hashlib.sha1(repr(sorted(
+        (n['bssid'] or '', n['ssid'] or '', n['security_type'] or '') for n in by_bssid.values()
+    )).encode()).hexdigest()
+    networks = {'by_bssid': by_bssid, 'by_ssid': by_ssid, 'count': count, 'etag': etag}
+    cache_set_json(key, networks, CLASSROOM_WIFI_CACHE_SECONDS)
+    return networks
+
+def invalidate_classroom_wifi_networks(classroom_id):
+    """Drop the cached WiFi networks after a classroom's networks change"""
+    cache_delete(CLASSROOM_WIFI_KEY.format(classroom_id))
+
+# A section's daily timetable is shared by every student in it; cache it briefly.
+# Timetables are only edited by the offline population scripts, so the TTL bounds staleness.
+SECTION_TIMETABLE_CACHE_SECONDS = 300
+SECTION_TIMETABLE_KEY = 'tt:{}:{}'
+
+def get_section_day_timetable(section_id, day_of_week):
+    """
+    Get a section's class slots for one day (breaks/lunch/free excluded),
+    ordered by slot number. Times are kept as 'HH:MM:SS' strings.
+    """
+    key = SECTION_TIMETABLE_KEY.format(section_id, day_of_week)
+    slots = cache_get_json(key)
+    if slots is not None:
+        return slots
+    
+    result = db.session.execute(Q_SECTION_DAY_TIMETABLE, {'section_id': section_id, 'day_of_week': day_of_week})
+    
+    slots = []
+    for row in result.mappings():
+        slot = dict(row)
+        slot['start_time'] = str(slot['start_time']) if slot['start_time'] is not None else None
+        slot['end_time'] = str(slot['end_time']) if slot['end_time'] is not None else None
+        slots.append(slot)
+    
+    cache_set_json(key, slots, SECTION_TIMETABLE_CACHE_SECONDS)
+    return slots
+
+# Day names as stored in timetable.day_of_week, indexed by datetime.weekday()
+TIMETABLE_DAYS = ('MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY')
+
+def _slot_seconds(value):
+    """Convert a cached 'HH:MM:SS' slot time into seconds since midnight"""
+    if not value:
+        return None
+    hours, minutes, seconds = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(float(seconds))
+
 @mobile_bp.route('/device/connect', methods=['POST'])
 def device_connect():
     """
@@ -24,31 +402,34 @@ def device_connect():
     This endpoint is called when a device first connects to the server
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
         data = request.get_json()
         
         if not data:
             return jsonify({'error': 'JSON data required'}), 400
         
-        # Extract device information
-        device_info = data.get('device_info', {})
-        device_uuid = device_info.get('device_id')
-        device_name = device_info.get('device_name', 'Unknown Device')
-        device_type = device_info.get('device_type', 'android')
-        device_model = device_info.get('device_model')
-        os_version = device_info.get('os_version')
-        app_version = device_info.get('app_version')
+        # Extract and validate device information
+        device_info, error = parse_device_info(data.get('device_info'))
+        if error:
+            return jsonify({'error': error}), 400
+        
+        device_uuid = device_info['device_id']
+        device_name = device_info['device_name']
+        device_type = device_info['device_type']
+        device_model = device_info['device_model']
+        os_version = device_info['os_version']
+        app_version = device_info['app_version']
         
         if not device_uuid:
             return jsonify({'error': 'Device ID is required'}), 400
         
+        # Skip the lookup and UPDATE when an identical reconnect was just handled
+        fingerprint = (device_name, device_type, device_model, os_version, app_version)
+        cached_response = _get_device_echo(device_uuid, fingerprint)
+        if cached_response is not None:
+            return jsonify(cached_response), 200
+        
         # Check if device already exists
-        device = StudentDevices.query.filter(
-            getattr(StudentDevices, 'device_uuid') == device_uuid
-        ).first()
+        device = find_device_by_uuid(device_uuid)
         
         if device:
             # Update existing device
@@ -71,6 +452,7 @@ def device_connect():
                 'student_email': student.email if student else None,
                 'message': 'Device reconnected successfully'
             }
+            _remember_device_echo(device_uuid, fingerprint, response_data)
         else:
             # Attempt to create a new device record with nullable student_id
             try:
@@ -123,10 +505,6 @@ def student_login():
     Returns JWT token for authenticated access
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db, create_access_token
-        
         data = request.get_json()
         
         if not data:
@@ -150,7 +528,8 @@ def student_login():
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Create JWT tokens using the same approach as the main app
-        claims = {'type': 'student', 'student_id': student.student_id}
+        # Email is embedded so high-frequency endpoints can skip the student lookup
+        claims = build_student_claims(student)
         access_token = create_access_token(
             identity=str(student.student_id),
             additional_claims=claims
@@ -158,12 +537,14 @@ def student_login():
         
         # Associate device with student if device_uuid is provided
         if device_uuid:
-            device = StudentDevices.query.filter_by(device_uuid=device_uuid).first()
+            device = find_device_by_uuid(device_uuid)
             
             if device:
                 device.student_id = student.student_id
                 device.last_seen = datetime.utcnow()
                 db.session.commit()
+                # Evict again after commit so a connect racing the flush cannot re-cache the old owner
+                forget_device_echo(device_uuid)
         
         # Prepare response
         response_data = {
@@ -189,33 +570,21 @@ def student_login():
 
 @mobile_bp.route('/device/status', methods=['GET'])
 @jwt_required()
-def get_device_status():
+@student_required
+def get_device_status(student_id):
     """
     Get device status and permissions for the current student
     Shows if phone is connected and which account is logged in
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get student details
-        student = Student.query.get(student_id)
+        # Get student details with devices loaded in one batched IN query
+        student = Student.query.options(selectinload(Student.devices)).get(student_id)
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
-        # Get all devices for this student
-        devices = StudentDevices.query.filter_by(student_id=student_id).all()
-        
+        online_cutoff = datetime.utcnow() - ONLINE_WINDOW
         device_list = []
-        for device in devices:
+        for device in student.devices:
             device_list.append({
                 'device_id': device.device_id,
                 'device_uuid': device.device_uuid,
@@ -229,7 +598,7 @@ def get_device_status():
                 'bluetooth_permission': device.bluetooth_permission,
                 'biometric_enabled': device.biometric_enabled,
                 'last_seen': device.last_seen.isoformat() if device.last_seen else None,
-                'is_online': (datetime.utcnow() - device.last_seen).total_seconds() < 300 if device.last_seen else False  # Online if seen in last 5 minutes
+                'is_online': device.last_seen is not None and device.last_seen > online_cutoff  # Online if seen in last 5 minutes
             })
         
         return jsonify({
@@ -246,29 +615,16 @@ def get_device_status():
 
 @mobile_bp.route('/data/collect', methods=['POST'])
 @jwt_required()
-def collect_mobile_data():
+@student_required
+def collect_mobile_data(student_id):
     """
     Collect data from mobile device in JSON format
     This endpoint receives all sensor data from the mobile app
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
         claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get student details
-        student = Student.query.get(student_id)
-        if not student:
-            return jsonify({'error': 'Student not found'}), 404
-            
-        student_email = student.email
+        # Student email is carried in the JWT claims (set at login)
+        student_email = claims.get('email')
         data = request.get_json()
         
         if not data:
@@ -288,14 +644,14 @@ def collect_mobile_data():
         # Update device information
         device_uuid = device_info.get('device_id')
         if device_uuid:
-            device = StudentDevices.query.filter_by(device_uuid=device_uuid, student_id=student_id).first()
+            # Only fields present in the payload are overwritten
+            device_updates = {'last_seen': datetime.utcnow()}
+            for field in ('location_permission', 'bluetooth_permission', 'biometric_enabled'):
+                if field in device_info:
+                    device_updates[field] = device_info[field]
             
-            if device:
-                device.last_seen = datetime.utcnow()
-                device.location_permission = device_info.get('location_permission', device.location_permission)
-                device.bluetooth_permission = device_info.get('bluetooth_permission', device.bluetooth_permission)
-                device.biometric_enabled = device_info.get('biometric_enabled', device.biometric_enabled)
-                db.session.commit()
+            update_student_device(student_id, device_uuid, device_updates)
+            db.session.commit()
         
         # Prepare response with detailed information about received data
         response_data = {
@@ -346,56 +702,55 @@ def collect_mobile_data():
 def mobile_logout():
     """Logout mobile device"""
     try:
-        # Import models and JWT components within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db, jwt_blacklist, jwt_blacklist_lock
-        
         # Get JWT claims
         claims = get_jwt()
-        jti = claims['jti']
         student_id = claims.get('student_id')
         
-        # Add token to blacklist
-        with jwt_blacklist_lock:
-            jwt_blacklist.add(jti)
+        # Revoke token until it would have expired anyway
+        revoke_jti(claims['jti'], claims['exp'])
         
         # Clear device last_seen if device_uuid provided
         data = request.get_json()
         device_uuid = data.get('device_uuid') if data else None
         
         if device_uuid:
-            device = StudentDevices.query.filter_by(
+            # Single UPDATE statement; no row is loaded into the session
+            StudentDevices.query.filter_by(
                 student_id=student_id,
                 device_uuid=device_uuid
-            ).first()
-            
-            if device:
-                device.last_seen = None
-                db.session.commit()
+            ).update({'last_seen': None}, synchronize_session=False)
+            db.session.commit()
         
         return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
     except Exception as e:
         logger.error(f"Error during mobile logout: {e}")
         return jsonify({'error': str(e)}), 500
 
-@mobile_bp.route('/session/status/<int:session_id>', methods=['GET'])
+@mobile_bp.route('/logout-all', methods=['POST'])
 @jwt_required()
-def get_session_status(session_id):
-    """Check if session is still active before scanning"""
+@student_required
+def mobile_logout_all(student_id):
+    """Logout the current student from every device"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
         claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
         
-        student_id = claims.get('student_id')
+        # One UPDATE invalidates every token carrying the previous version
+        bump_student_token_version(student_id)
+        revoke_jti(claims['jti'], claims['exp'])
         
-        # Get session
-        session = AttendanceSession.query.get(session_id)
+        return jsonify({'success': True, 'message': 'Logged out from all devices'}), 200
+    except Exception as e:
+        logger.error(f"Error during mobile logout-all: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@mobile_bp.route('/session/status/<int:session_id>', methods=['GET'])
+@jwt_required()
+@student_required
+def get_session_status(session_id, student_id):
+    """Check if session is still active before scanning"""
+    try:
+        # Get session and its class in one round trip
+        session = db.session.execute(Q_SESSION_STATUS, {'session_id': session_id}).first()
         
         if not session:
             return jsonify({'active': False, 'reason': 'Session not found'}), 404
@@ -409,17 +764,14 @@ def get_session_status(session_id):
             is_expired = True
             is_active = False
         
-        # Get class information
-        class_obj = Classes.query.get(session.class_id) if session.class_id else None
-        
         response_data = {
             'active': is_active,
             'session_id': session_id,
             'status': session.status,
             'expires_at': session.qr_expires_at.isoformat() if session.qr_expires_at else None,
             'is_expired': is_expired,
-            'class_name': class_obj.class_name if class_obj else None,
-            'class_code': class_obj.class_code if class_obj else None
+            'class_name': session.class_name,
+            'class_code': session.class_code
         }
         
         if not is_active:
@@ -439,78 +791,39 @@ def get_session_status(session_id):
 
 @mobile_bp.route('/student/timetable/today', methods=['GET'])
 @jwt_required()
-def get_todays_timetable():
+@student_required
+def get_todays_timetable(student_id):
     """Get today's timetable for the current student"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            from sqlalchemy import text
-            from datetime import datetime
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         # Get current day of week in uppercase format (as stored in DB)
-        day_of_week = datetime.now().strftime('%A').upper()
-        
-        # Get the student's section
-        student_query = text("""
-            SELECT s.student_code, s.first_name, s.last_name, sec.id as section_id, sec.section_name
-            FROM students s
-            JOIN sections sec ON s.section_id = sec.id
-            WHERE s.student_id = :student_id
-        """)
-        
-        student_result = db.session.execute(student_query, {'student_id': student_id})
-        student_row = student_result.fetchone()
+        day_of_week = TIMETABLE_DAYS[datetime.now().weekday()]
         
+        # Get the student's section (cached)
+        student_row = get_student_section(student_id)
         if not student_row:
             return jsonify({'error': 'Student not found'}), 404
         
-        section_id = student_row.section_id
-        
-        # Get timetable for the student's section, excluding breaks/lunch/free slots
-        timetable_query = text("""
-            SELECT t.id, t.day_of_week, t.slot_number, t.slot_type, 
-                   t.start_time, t.end_time, t.subject_code, s.subject_name, s.short_name, s.faculty_name, t.room_number
-            FROM timetable t
-            LEFT JOIN subjects s ON t.subject_code = s.subject_code
-            WHERE t.section_id = :section_id 
-            AND t.day_of_week = :day_of_week
-            AND t.slot_type NOT IN ('break', 'lunch', 'free')
-            AND t.subject_code IS NOT NULL 
-            AND t.subject_code != ''
-            ORDER BY t.slot_number, t.start_time
-        """)
-        
-        result = db.session.execute(timetable_query, {'section_id': section_id, 'day_of_week': day_of_week})
         sessions = []
-        
-        for row in result:
+        for row in get_section_day_timetable(student_row['section_id'], day_of_week):
             sessions.append({
-                'id': row.id,
+                'id': row['id'],
                 'subject_id': 0,  # Placeholder - subject_id not in timetable table
-                'subject_name': row.subject_name if row.subject_name else row.subject_code,
-                'subject_code': row.subject_code,
-                'short_name': row.short_name if row.short_name else row.subject_code,
-                'teacher_name': row.faculty_name if row.faculty_name else 'TBA',
-                'room_number': row.room_number,
-                'start_time': str(row.start_time) if row.start_time else None,
-                'end_time': str(row.end_time) if row.end_time else None,
-                'section': student_row.section_name
+                'subject_name': row['subject_name'] if row['subject_name'] else row['subject_code'],
+                'subject_code': row['subject_code'],
+                'short_name': row['short_name'] if row['short_name'] else row['subject_code'],
+                'teacher_name': row['faculty_name'] if row['faculty_name'] else 'TBA',
+                'room_number': row['room_number'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'section': student_row['section_name']
             })
         
         # Get student info for response
         student_info = {
             'student_id': student_id,
-            'name': f'{student_row.first_name} {student_row.last_name}',
-            'section': student_row.section_name,
-            'program': student_row.program if hasattr(student_row, 'program') else 'CSE(AIML)'
+            'name': f"{student_row['first_name']} {student_row['last_name']}",
+            'section': student_row['section_name'],
+            'program': student_row.get('program', 'CSE(AIML)')
         }
         
         return jsonify({
@@ -531,66 +844,28 @@ def get_todays_timetable():
 
 @mobile_bp.route('/student/timetable', methods=['GET'])
 @jwt_required()
-def get_student_timetable():
+@student_required
+def get_student_timetable(student_id):
     """Get complete timetable for the current student"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            from sqlalchemy import text
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get student details including section
-        student_query = text("""
-            SELECT s.student_code, s.first_name, s.last_name, sec.section_name, sec.course, sec.room_number
-            FROM students s
-            JOIN sections sec ON s.section_id = sec.id
-            WHERE s.student_id = :student_id
-        """)
-        
-        student_result = db.session.execute(student_query, {'student_id': student_id})
-        student_row = student_result.fetchone()
-        
+        # Get student details including section (cached)
+        student_row = get_student_section(student_id)
         if not student_row:
             return jsonify({'error': 'Student not found'}), 404
         
         student_info = {
-            'studentCode': student_row[0],
-            'name': student_row[1] + (' ' + student_row[2] if student_row[2] else ''),
-            'section': student_row[3],
-            'course': student_row[4],
-            'room': student_row[5]
+            'studentCode': student_row['student_code'],
+            'name': student_row['first_name'] + (' ' + student_row['last_name'] if student_row['last_name'] else ''),
+            'section': student_row['section_name'],
+            'course': student_row['course'],
+            'room': student_row['room_number']
         }
         
         # Get timetable for the student's section, excluding breaks/lunch/free slots
-        timetable_query = text("""
-            SELECT t.day_of_week, t.slot_number, t.start_time, t.end_time, t.subject_code, 
-                   t.slot_type, t.room_number, sub.subject_name, sub.short_name, sub.faculty_name
-            FROM timetable t
-            JOIN sections sec ON t.section_id = sec.id
-            LEFT JOIN subjects sub ON t.subject_code = sub.subject_code
-            WHERE t.section_id = (SELECT section_id FROM students WHERE student_id = :student_id)
-            AND t.slot_type NOT IN ('break', 'lunch', 'free')
-            AND t.subject_code IS NOT NULL
-            AND t.subject_code != ''
-            ORDER BY FIELD(t.day_of_week, 'MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY'), 
-                     t.slot_number, t.start_time
-        """)
-        
-        result = db.session.execute(timetable_query, {'student_id': student_id})
+        result = db.session.execute(Q_STUDENT_TIMETABLE, {'section_id': student_row['section_id']})
         
         # Organize timetable by day
-        timetable_schedule = {}
-        days = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
-        
-        for day in days:
-            timetable_schedule[day] = []
+        timetable_schedule = {day: [] for day in TIMETABLE_DAYS}
         
         for row in result:
             slot_data = {
@@ -623,124 +898,74 @@ def get_student_timetable():
 
 @mobile_bp.route('/student/current-session', methods=['GET'])
 @jwt_required()
-def get_current_session():
+@student_required
+def get_current_session(student_id):
     """Get current and next session for the student"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            from sqlalchemy import text
-            from datetime import datetime, time
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get current day and time
+        # Get current day and time (seconds since midnight)
         now = datetime.now()
-        current_day = now.strftime('%A').upper()
-        current_time = now.time()
+        current_day = TIMETABLE_DAYS[now.weekday()]
+        now_secs = now.hour * 3600 + now.minute * 60 + now.second
         
-        # Get student's section
-        section_query = text("SELECT section_id FROM students WHERE student_id = :student_id")
-        section_result = db.session.execute(section_query, {'student_id': student_id})
-        section_row = section_result.fetchone()
-        
-        if not section_row:
+        # Get student's section (cached)
+        student_row = get_student_section(student_id)
+        if not student_row:
             return jsonify({'error': 'Student not found'}), 404
         
-        section_id = section_row[0]
-        
-        # Get current session, excluding breaks/lunch/free slots
-        current_session_query = text("""
-            SELECT t.id, t.start_time, t.end_time, t.subject_code, t.slot_type, t.room_number,
-                   sub.subject_name, sub.short_name, sub.faculty_name
-            FROM timetable t
-            LEFT JOIN subjects sub ON t.subject_code = sub.subject_code
-            WHERE t.section_id = :section_id 
-            AND t.day_of_week = :day_of_week
-            AND t.start_time <= :current_time 
-            AND t.end_time > :current_time
-            AND t.slot_type NOT IN ('break', 'lunch', 'free')
-            AND t.subject_code IS NOT NULL
-            AND t.subject_code != ''
-            ORDER BY t.start_time
-            LIMIT 1
-        """)
-        
-        current_result = db.session.execute(current_session_query, {
-            'section_id': section_id,
-            'day_of_week': current_day,
-            'current_time': current_time
-        })
-        
-        current_row = current_result.fetchone()
+        # Pick current and next session from the section's (cached) timetable for today
+        current_row = None
+        next_row = None
+        next_start = None
+        for slot in get_section_day_timetable(student_row['section_id'], current_day):
+            start_secs = _slot_seconds(slot['start_time'])
+            end_secs = _slot_seconds(slot['end_time'])
+            if start_secs is None or end_secs is None:
+                continue
+            
+            if start_secs <= now_secs < end_secs:
+                if current_row is None or start_secs < current_row[1]:
+                    current_row = (slot, start_secs, end_secs)
+            elif start_secs > now_secs:
+                if next_start is None or start_secs < next_start:
+                    next_row = (slot, start_secs, end_secs)
+                    next_start = start_secs
         
         current_session = None
         if current_row:
-            start_time_obj = current_row[1]
-            end_time_obj = current_row[2]
+            slot, start_secs, end_secs = current_row
             
             # Calculate elapsed and remaining time
-            elapsed_minutes = int((now - datetime.combine(now.date(), start_time_obj)).total_seconds() / 60)
-            remaining_minutes = int((datetime.combine(now.date(), end_time_obj) - now).total_seconds() / 60)
+            elapsed_minutes = (now_secs - start_secs) // 60
+            remaining_minutes = (end_secs - now_secs) // 60
             
             current_session = {
                 'isActive': True,
-                'subjectCode': current_row[3],
-                'subjectName': current_row[6] if current_row[6] else (current_row[3] if current_row[3] else ''),
-                'shortName': current_row[7] if current_row[7] else (current_row[3] if current_row[3] else ''),
-                'facultyName': current_row[8],
-                'startTime': str(start_time_obj)[:-3] if start_time_obj else None,
-                'endTime': str(end_time_obj)[:-3] if end_time_obj else None,
-                'room': current_row[5],
+                'subjectCode': slot['subject_code'],
+                'subjectName': slot['subject_name'] if slot['subject_name'] else (slot['subject_code'] if slot['subject_code'] else ''),
+                'shortName': slot['short_name'] if slot['short_name'] else (slot['subject_code'] if slot['subject_code'] else ''),
+                'facultyName': slot['faculty_name'],
+                'startTime': slot['start_time'][:-3],
+                'endTime': slot['end_time'][:-3],
+                'room': slot['room_number'],
                 'minutesElapsed': max(0, elapsed_minutes),
                 'minutesRemaining': max(0, remaining_minutes)
             }
         
-        # Get next session, excluding breaks/lunch/free slots
-        next_session_query = text("""
-            SELECT t.id, t.start_time, t.end_time, t.subject_code, t.slot_type, t.room_number,
-                   sub.subject_name, sub.short_name, sub.faculty_name
-            FROM timetable t
-            LEFT JOIN subjects sub ON t.subject_code = sub.subject_code
-            WHERE t.section_id = :section_id 
-            AND t.day_of_week = :day_of_week
-            AND t.start_time > :current_time
-            AND t.slot_type NOT IN ('break', 'lunch', 'free')
-            AND t.subject_code IS NOT NULL
-            AND t.subject_code != ''
-            ORDER BY t.start_time
-            LIMIT 1
-        """)
-        
-        next_result = db.session.execute(next_session_query, {
-            'section_id': section_id,
-            'day_of_week': current_day,
-            'current_time': current_time
-        })
-        
-        next_row = next_result.fetchone()
-        
         next_session = None
         if next_row:
-            start_time_obj = next_row[1]
-            end_time_obj = next_row[2]
+            slot, start_secs, end_secs = next_row
             
             # Calculate minutes until start
-            minutes_until_start = int((datetime.combine(now.date(), start_time_obj) - now).total_seconds() / 60)
+            minutes_until_start = (start_secs - now_secs) // 60
             
             next_session = {
-                'subjectCode': next_row[3],
-                'subjectName': next_row[6] if next_row[6] else (next_row[3] if next_row[3] else ''),
-                'shortName': next_row[7] if next_row[7] else (next_row[3] if next_row[3] else ''),
-                'facultyName': next_row[8],
-                'startTime': str(start_time_obj)[:-3] if start_time_obj else None,
-                'endTime': str(end_time_obj)[:-3] if end_time_obj else None,
-                'room': next_row[5],
+                'subjectCode': slot['subject_code'],
+                'subjectName': slot['subject_name'] if slot['subject_name'] else (slot['subject_code'] if slot['subject_code'] else ''),
+                'shortName': slot['short_name'] if slot['short_name'] else (slot['subject_code'] if slot['subject_code'] else ''),
+                'facultyName': slot['faculty_name'],
+                'startTime': slot['start_time'][:-3],
+                'endTime': slot['end_time'][:-3],
+                'room': slot['room_number'],
                 'minutesUntilStart': max(0, minutes_until_start)
             }
         
@@ -773,59 +998,24 @@ def get_current_session():
 
 @mobile_bp.route('/student/attendance/summary', methods=['GET'])
 @jwt_required()
-def get_attendance_summary():
+@student_required
+def get_attendance_summary(student_id):
     """Get subject-level attendance summary for the History page"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            from sqlalchemy import text
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         # Get subject-wise statistics
-        subject_stats_query = text("""
-            SELECT 
-                s.subject_code,
-                s.subject_name,
-                s.short_name,
-                f.first_name,
-                f.last_name,
-                ast.total_sessions,
-                ast.attended_sessions,
-                ast.attendance_percentage
-            FROM attendance_statistics ast
-            JOIN subjects s ON ast.subject_id = s.id
-            LEFT JOIN faculty f ON s.faculty_id = f.faculty_id
-            WHERE ast.student_id = :student_id AND ast.subject_id IS NOT NULL
-            ORDER BY ast.total_sessions DESC, s.subject_name
-        """)
-        
-        subject_result = db.session.execute(subject_stats_query, {'student_id': student_id})
-        subject_stats = subject_result.fetchall()
+        subject_result = db.session.execute(Q_ATTENDANCE_SUMMARY, {'student_id': student_id})
         
         # Format subject stats for the History page
         subject_stats_list = []
-        for row in subject_stats:
-            # Calculate percentage
-            percentage = float(row[7]) if row[7] is not None else 0.0
-            
-            # Get faculty name
-            faculty_name = f"{row[3]} {row[4]}".strip() if row[3] or row[4] else "Unknown Faculty"
-            
+        for row in subject_result:
             subject_stats_list.append({
-                'subject_code': row[0],
-                'subject_name': row[1],
-                'short_name': row[2],
-                'faculty_name': faculty_name,
-                'total_classes': row[5] if row[5] is not None else 0,
-                'attended_count': row[6] if row[6] is not None else 0,
-                'percentage': percentage
+                'subject_code': row.subject_code,
+                'subject_name': row.subject_name,
+                'short_name': row.short_name,
+                'faculty_name': row.faculty_name or "Unknown Faculty",
+                'total_classes': row.total_sessions if row.total_sessions is not None else 0,
+                'attended_count': row.attended_sessions if row.attended_sessions is not None else 0,
+                'percentage': float(row.attendance_percentage) if row.attendance_percentage is not None else 0.0
             })
         
         return jsonify({
@@ -843,80 +1033,48 @@ def get_attendance_summary():
 
 @mobile_bp.route('/student/attendance/history', methods=['GET'])
 @jwt_required()
-def get_attendance_history():
+@student_required
+def get_attendance_history(student_id):
     """Get detailed attendance history with filters"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            from sqlalchemy import text
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         # Get query parameters
         limit = request.args.get('limit', 50, type=int)
         from_date = request.args.get('from')
         to_date = request.args.get('to')
         
-        # Build query with filters
-        query_parts = [
-            "SELECT",
-            "  ah.record_id,",
-            "  ah.session_id,",
-            "  s.subject_code,",
-            "  s.subject_name,",
-            "  f.first_name,",
-            "  f.last_name,",
-            "  ah.status,",
-            "  ah.verification_score,",
-            "  ah.scan_timestamp",
-            "FROM attendance_records ah",
-            "JOIN students st ON ah.student_id = st.student_id",
-            "JOIN timetable t ON ah.session_id = t.id",
-            "JOIN subjects s ON t.subject_code = s.subject_code",
-            "LEFT JOIN faculty f ON s.faculty_id = f.faculty_id",
-            "WHERE ah.student_id = :student_id"
-        ]
-        
         params = {'student_id': student_id}
         
         if from_date:
-            query_parts.append("AND DATE(ah.scan_timestamp) >= :from_date")
             params['from_date'] = from_date
         
         if to_date:
-            query_parts.append("AND DATE(ah.scan_timestamp) <= :to_date")
             params['to_date'] = to_date
         
-        query_parts.append("ORDER BY ah.scan_timestamp DESC")
-        query_parts.append("LIMIT :limit")
         params['limit'] = min(limit, 100)  # Cap at 100 records
         
-        query = " ".join(query_parts)
+        query = Q_ATTENDANCE_HISTORY[(bool(from_date), bool(to_date))]
         
-        result = db.session.execute(text(query), params)
-        rows = result.fetchall()
+        # Iterate the cursor directly as mappings instead of materializing Row objects
+        rows = db.session.execute(query, params).mappings()
         
         # Format history records
         history_list = []
         for row in rows:
-            # Get faculty name
-            faculty_name = f"{row[4]} {row[5]}".strip() if row[4] or row[5] else "Unknown Faculty"
+            first_name = row['first_name']
+            last_name = row['last_name']
+            status = row['status']
+            score = row['verification_score']
+            scan_timestamp = row['scan_timestamp']
             
             history_list.append({
-                'record_id': row[0],
-                'session_id': row[1],
-                'subject_code': row[2],
-                'subject_name': row[3],
-                'faculty_name': faculty_name,
-                'status': row[6].upper() if row[6] else "UNKNOWN",
-                'verification_score': float(row[7]) if row[7] is not None else 0.0,
-                'scan_timestamp': row[8].isoformat() if row[8] else None
+                'record_id': row['record_id'],
+                'session_id': row['session_id'],
+                'subject_code': row['subject_code'],
+                'subject_name': row['subject_name'],
+                'faculty_name': f"{first_name} {last_name}".strip() if first_name or last_name else "Unknown Faculty",
+                'status': status.upper() if status else "UNKNOWN",
+                'verification_score': float(score) if score is not None else 0.0,
+                'scan_timestamp': scan_timestamp.isoformat() if scan_timestamp else None
             })
         
         return jsonify({
@@ -933,39 +1091,26 @@ def get_attendance_history():
 
 @mobile_bp.route('/attendance/monthly-overview', methods=['GET'])
 @jwt_required()
-def get_monthly_overview():
+@student_required
+def get_monthly_overview(student_id):
     """Get week-by-week attendance for chart"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get current month
+        # Get current month (weeks are counted from midnight on the 1st)
         today = datetime.now()
-        start_of_month = today.replace(day=1)
+        start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_of_range = start_of_month + timedelta(days=28)
+        
+        # Count attendance for all four weeks in a single aggregate query
+        result = db.session.execute(Q_MONTHLY_WEEKS, {
+            'student_id': student_id,
+            'start_of_month': start_of_month,
+            'end_of_range': end_of_range
+        })
+        weekly_counts = {int(row.week_num): (int(row.total), int(row.present or 0)) for row in result}
         
-        # Calculate attendance for each week
         weeks = []
         for week_num in range(1, 5):
-            week_start = start_of_month + timedelta(days=(week_num - 1) * 7)
-            week_end = week_start + timedelta(days=7)
-            
-            # Count attendance for this week
-            records = AttendanceRecord.query.filter(
-                getattr(AttendanceRecord, 'student_id') == student_id,
-                getattr(AttendanceRecord, 'scan_timestamp') >= week_start,
-                getattr(AttendanceRecord, 'scan_timestamp') < week_end
-            ).all()
-            
-            total = len(records)
-            present = sum(1 for r in records if r.status == 'present')
+            total, present = weekly_counts.get(week_num, (0, 0))
             percentage = (present / total * 100) if total > 0 else 0
             
             weeks.append({
@@ -987,20 +1132,10 @@ def get_monthly_overview():
 
 @mobile_bp.route('/notifications/register', methods=['POST'])
 @jwt_required()
-def register_fcm_token():
+@student_required
+def register_fcm_token(student_id):
     """Register FCM token for push notifications"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         data = request.get_json()
         device_uuid = data.get('device_uuid')
         fcm_token = data.get('fcm_token')
@@ -1008,14 +1143,13 @@ def register_fcm_token():
         if not fcm_token:
             return jsonify({'error': 'FCM token required'}), 400
         
-        # Update device with FCM token
-        device = StudentDevices.query.filter_by(
+        # Update device with FCM token in a single UPDATE statement
+        updated = StudentDevices.query.filter_by(
             student_id=student_id,
             device_uuid=device_uuid
-        ).first()
+        ).update({'fcm_token': fcm_token}, synchronize_session=False)
         
-        if device:
-            device.fcm_token = fcm_token
+        if updated:
             db.session.commit()
             return jsonify({'success': True}), 200
         
@@ -1027,28 +1161,17 @@ def register_fcm_token():
 
 @mobile_bp.route('/notifications/toggle', methods=['POST'])
 @jwt_required()
-def toggle_notifications():
+@student_required
+def toggle_notifications(student_id):
     """Enable/disable notifications"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         data = request.get_json()
         enabled = data.get('enabled', True)
         
-        # Update all devices for this student
-        devices = StudentDevices.query.filter_by(student_id=student_id).all()
-        for device in devices:
-            device.notifications_enabled = enabled
-        
+        # Update all devices for this student in a single UPDATE statement
+        StudentDevices.query.filter_by(student_id=student_id).update(
+            {'notifications_enabled': enabled}, synchronize_session=False
+        )
         db.session.commit()
         
         return jsonify({
@@ -1060,63 +1183,174 @@ def toggle_notifications():
         logger.error(f"Error toggling notifications: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Security violations are fire-and-forget audit rows; buffer them so a burst of
+# screenshot reports does not hold request threads on individual INSERTs
+SECURITY_VIOLATION_QUEUE_SIZE = 10000
+SECURITY_VIOLATION_BATCH_SIZE = 200
+SECURITY_VIOLATION_FLUSH_SECONDS = 1.0
+_violation_queue = queue.Queue(maxsize=SECURITY_VIOLATION_QUEUE_SIZE)
+SECURITY_VIOLATION_SHUTDOWN_SECONDS = 10.0
+SECURITY_VIOLATION_TYPES = frozenset(SecurityViolation.__table__.c.violation_type.type.enums)
+_violation_queue_closed = object()
+_violation_writer = None
+_violation_writer_lock = threading.Lock()
+
+def enqueue_security_violation(violation):
+    """
+    Buffer a security violation row for the background writer
+    Returns False if the buffer is full (caller should write it directly)
+    """
+    global _violation_writer
+    
+    if _violation_writer is None:
+        with _violation_writer_lock:
+            if _violation_writer is None:
+                flask_app = current_app._get_current_object()
+                _violation_writer = threading.Thread(
+                    target=_flush_security_violations, args=(flask_app,),
+                    daemon=True, name="security-violation-writer"
+                )
+                _violation_writer.start()
+                atexit.register(_stop_security_violation_writer)
+    
+    try:
+        _violation_queue.put_nowait(violation)
+        return True
+    except queue.Full:
+        return False
+
+def _stop_security_violation_writer():
+    """atexit hook: let the writer flush everything queued before the worker exits"""
+    try:
+        _violation_queue.put(_violation_queue_closed, timeout=SECURITY_VIOLATION_SHUTDOWN_SECONDS)
+    except queue.Full:
+        logger.error("Security violation buffer still full at shutdown; queued rows may be lost")
+        return
+    _violation_writer.join(timeout=SECURITY_VIOLATION_SHUTDOWN_SECONDS)
+
+def _flush_security_violations(flask_app):
+    """Writer thread: drain the buffer and insert violations with one executemany per batch"""
+    closed = False
+    while not closed:
+        batch = []
+        item = _violation_queue.get()
+        if item is _violation_queue_closed:
+            break
+        batch.append(item)
+        deadline = time.monotonic() + SECURITY_VIOLATION_FLUSH_SECONDS
+        while len(batch) < SECURITY_VIOLATION_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _violation_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _violation_queue_closed:
+                closed = True
+                break
+            batch.append(item)
+        
+        _write_security_violations(flask_app, batch)
+
+def _write_security_violations(flask_app, batch):
+    """Insert a batch of violations, falling back to row-by-row if the batch fails"""
+    with flask_app.app_context():
+        try:
+            db.session.execute(insert(SecurityViolation), batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Batch insert of {len(batch)} security violations failed, retrying individually: {e}")
+            # One bad row must not drop the rest of the batch
+            for violation in batch:
+                try:
+                    db.session.execute(insert(SecurityViolation), [violation])
+                    db.session.commit()
+                except Exception as row_error:
+                    db.session.rollback()
+                    logger.error(f"Dropping security violation for student {violation.get('student_id')}: {row_error}")
+        finally:
+            db.session.remove()
+
 @mobile_bp.route('/security/violation', methods=['POST'])
 @jwt_required()
-def log_security_violation():
+@student_required
+def log_security_violation(student_id):
     """Log security violations (screenshot, screen recording, etc.)"""
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db, SecurityViolation
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
         data = request.get_json()
+        if not data:
+            return jsonify({'error': 'JSON data required'}), 400
+        
         violation_type = data.get('type')  # screenshot, screen_recording, root_detected
+        # Reject bad types here - the writer thread cannot report a failed insert back
+        if not isinstance(violation_type, str) or violation_type not in SECURITY_VIOLATION_TYPES:
+            return jsonify({
+                'error': f"Invalid violation type. Must be one of: {', '.join(sorted(SECURITY_VIOLATION_TYPES))}"
+            }), 400
         device_info = data.get('device_info', {})
         details = data.get('details', {})
         
-        # Create security violation record
-        security_violation = SecurityViolation(
-            student_id=student_id,
-            violation_type=violation_type,
-            device_info=device_info,
-            details=details
-        )
-        
-        db.session.add(security_violation)
-        db.session.commit()
+        # Queue the security violation record; the writer thread inserts in batches
+        violation = {
+            'student_id': student_id,
+            'violation_type': violation_type,
+            'device_info': device_info,
+            'details': details,
+            'timestamp': datetime.utcnow()
+        }
         
         logger.warning(f"Security violation detected for student {student_id}: {violation_type}")
         
-        return jsonify({'success': True}), 200
+        if not enqueue_security_violation(violation):
+            # Buffer is full - write this one synchronously rather than drop it
+            db.session.execute(insert(SecurityViolation), [violation])
+            db.session.commit()
+            return jsonify({'success': True}), 200
+        
+        return jsonify({'success': True, 'queued': True}), 202
     except Exception as e:
         logger.error(f"Error logging security violation: {e}")
         return jsonify({'error': str(e)}), 500
 
+Q_STUDENT_PROFILE_VERSION = text("""
+    SELECT s.updated_at, MAX(d.updated_at) AS devices_updated_at, MAX(d.last_seen) AS last_seen,
+           COUNT(d.device_id) AS device_count,
+           SUM(CASE WHEN d.last_seen > :online_cutoff THEN 1 ELSE 0 END) AS online_count
+    FROM students s
+    LEFT JOIN student_devices d ON d.student_id = s.student_id
+    WHERE s.student_id = :student_id AND s.is_active = 1
+    GROUP BY s.student_id, s.updated_at
+""")
+
+def get_student_profile_etag(student_id):
+    """
+    Weak ETag for the profile/settings payloads: changes whenever the student row,
+    any device row, the device count or any device's online state changes.
+    Returns None if the student is missing or inactive (caller takes the normal path).
+    """
+    row = db.session.execute(Q_STUDENT_PROFILE_VERSION, {
+        'student_id': student_id,
+        'online_cutoff': datetime.utcnow() - ONLINE_WINDOW
+    }).first()
+    if row is None:
+        return None
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()
+
 @mobile_bp.route('/student/settings', methods=['GET'])
 @jwt_required()
-def get_student_settings():
+@student_required
+def get_student_settings(student_id):
     """
     Get current student settings
     This endpoint is used for the settings page in the mobile app
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
+        # Unchanged since the client's cached copy? Skip loading and encoding
+        etag = get_student_profile_etag(student_id)
+        if etag and request.if_none_match.contains_weak(etag):
+            return '', 304
         
         # Get student's devices to determine current settings
         devices = StudentDevices.query.filter_by(student_id=student_id).all()
@@ -1130,8 +1364,8 @@ def get_student_settings():
         if devices:
             # Use the first device's settings
             device = devices[0]
-            notifications_enabled = device.notifications_enabled if hasattr(device, 'notifications_enabled') else True
-            biometric_enabled = device.biometric_enabled if hasattr(device, 'biometric_enabled') else False
+            notifications_enabled = device.notifications_enabled
+            biometric_enabled = device.biometric_enabled
         
         settings_data = {
             'notifications_enabled': notifications_enabled,
@@ -1140,34 +1374,31 @@ def get_student_settings():
             'devices': len(devices)
         }
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'settings': settings_data,
             'message': 'Settings retrieved successfully'
-        }), 200
+        })
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Error getting student settings: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Device columns the settings endpoint may change
+DEVICE_SETTING_FIELDS = ('notifications_enabled', 'biometric_enabled')
+
 @mobile_bp.route('/student/settings', methods=['POST'])
 @jwt_required()
-def update_student_settings():
+@student_required
+def update_student_settings(student_id):
     """
     Update student settings
     This endpoint is used to save settings changes from the mobile app
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
         data = request.get_json()
         
         if not data:
@@ -1178,27 +1409,14 @@ def update_student_settings():
         biometric_enabled = data.get('biometric_enabled')
         dark_mode = data.get('dark_mode')
         
-        # Update all devices for this student with the new settings
-        devices = StudentDevices.query.filter_by(student_id=student_id).all()
+        # Update all devices for this student with the new settings in one UPDATE
+        values = {field: data[field] for field in DEVICE_SETTING_FIELDS if data.get(field) is not None}
         
         updated_devices = 0
-        for device in devices:
-            updated = False
-            
-            # Update notifications setting if provided
-            if notifications_enabled is not None and hasattr(device, 'notifications_enabled'):
-                device.notifications_enabled = notifications_enabled
-                updated = True
-            
-            # Update biometric setting if provided
-            if biometric_enabled is not None and hasattr(device, 'biometric_enabled'):
-                device.biometric_enabled = biometric_enabled
-                updated = True
-            
-            if updated:
-                updated_devices += 1
-        
-        if updated_devices > 0:
+        if values:
+            updated_devices = StudentDevices.query.filter_by(student_id=student_id).update(
+                values, synchronize_session=False
+            )
             db.session.commit()
         
         return jsonify({
@@ -1215,32 +1433,41 @@ def update_student_settings():
         logger.error(f"Error updating student settings: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Columns read by the profile endpoint (fetched as rows, not ORM objects)
+PROFILE_STUDENT_COLUMNS = (
+    Student.student_id, Student.student_code, Student.first_name, Student.last_name,
+    Student.email, Student.phone_number, Student.program, Student.year_of_study,
+    Student.is_active, Student.created_at, Student.updated_at
+)
+PROFILE_DEVICE_COLUMNS = (
+    StudentDevices.device_id, StudentDevices.device_uuid, StudentDevices.device_name,
+    StudentDevices.device_type, StudentDevices.device_model, StudentDevices.os_version,
+    StudentDevices.app_version, StudentDevices.notifications_enabled,
+    StudentDevices.biometric_enabled, StudentDevices.last_seen
+)
+
 @mobile_bp.route('/student/profile', methods=['GET'])
 @mobile_bp.route('/student/me', methods=['GET'])
 @jwt_required()
-def get_student_profile():
+@student_required
+def get_student_profile(student_id):
     """
     Get current student profile information
     This endpoint is used for the profile page in the mobile app
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
+        # Unchanged since the client's cached copy? Skip loading and encoding
+        etag = get_student_profile_etag(student_id)
+        if etag and request.if_none_match.contains_weak(etag):
+            return '', 304
         
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        student = Student.query.get(student_id)
+        # Read-only columns as plain rows; no ORM objects are hydrated
+        student = db.session.query(*PROFILE_STUDENT_COLUMNS).filter(Student.student_id == student_id).first()
         
         if not student or not student.is_active:
             return jsonify({'error': 'Student not found or inactive'}), 404
         
-        # Get student's device information
-        devices = StudentDevices.query.filter_by(student_id=student_id).all()
+        devices = db.session.query(*PROFILE_DEVICE_COLUMNS).filter(StudentDevices.student_id == student_id).all()
         
         student_data = {
             'student_id': student.student_id,
@@ -1257,6 +1484,7 @@ def get_student_profile():
         }
         
         # Add device information
+        online_cutoff = datetime.utcnow() - ONLINE_WINDOW
         device_list = []
         for device in devices:
             device_list.append({
@@ -1267,42 +1495,53 @@ def get_student_profile():
                 'device_model': device.device_model,
                 'os_version': device.os_version,
                 'app_version': device.app_version,
-                'notifications_enabled': device.notifications_enabled if hasattr(device, 'notifications_enabled') else True,
+                'notifications_enabled': device.notifications_enabled,
                 'biometric_enabled': device.biometric_enabled,
                 'last_seen': device.last_seen.isoformat() if device.last_seen else None,
-                'is_online': (datetime.utcnow() - device.last_seen).total_seconds() < 300 if device.last_seen else False
+                'is_online': device.last_seen is not None and device.last_seen > online_cutoff
             })
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'student': student_data,
             'devices': device_list,
             'message': 'Profile retrieved successfully'
-        }), 200
+        })
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Error getting student profile: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# (100ms bucket, encoded JSON body) for the most recent /time/sync response
+TIME_SYNC_BUCKET_NS = 100_000_000
+_time_sync_cache = None
+
 @mobile_bp.route('/time/sync', methods=['GET'])
 def time_sync():
     """
     Server time synchronization endpoint
     Prevents time manipulation attacks by providing accurate server time
     """
+    global _time_sync_cache
     try:
-        from datetime import datetime
-        import time
+        # Concurrent requests within the same 100ms window share one encoded body
+        bucket = time.monotonic_ns() // TIME_SYNC_BUCKET_NS
+        cached = _time_sync_cache
+        if cached is None or cached[0] != bucket:
+            now = time.time()
+            body = current_app.json.dumps({
+                'success': True,
+                'server_time': datetime.utcfromtimestamp(now).isoformat(),
+                'timestamp': int(now * 1000),
+                'timezone': 'UTC'
+            })
+            cached = (bucket, body)
+            _time_sync_cache = cached
         
-        server_time = datetime.utcnow()
-        timestamp = int(time.mktime(server_time.timetuple())) * 1000 + server_time.microsecond // 1000
-        
-        return jsonify({
-            'success': True,
-            'server_time': server_time.isoformat(),
-            'timestamp': timestamp,
-            'timezone': 'UTC'
-        }), 200
+        return current_app.response_class(cached[1], mimetype='application/json'), 200
         
     except Exception as e:
         logger.error(f"Error in time sync endpoint: {str(e)}")
@@ -1310,22 +1549,13 @@ def time_sync():
 
 @mobile_bp.route('/auth/biometric-verify', methods=['POST'])
 @jwt_required()
-def biometric_verify():
+@student_required
+def biometric_verify(student_id):
     """
     Log biometric verification for audit trail
     Enhances security by tracking biometric success/failure on server
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db, SecurityViolation
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
         data = request.get_json()
         
         if not data:
@@ -1349,7 +1579,7 @@ def biometric_verify():
                 details={
                     'method': verification_method,
                     'confidence_score': confidence_score,
-                    'timestamp': datetime.utcnow().isoformat()
+                    'timestamp': int(time.time())
                 }
             )
             
@@ -1359,7 +1589,7 @@ def biometric_verify():
         return jsonify({
             'success': True,
             'message': 'Biometric verification logged',
-            'verification_id': str(student_id) + '_' + str(int(datetime.utcnow().timestamp()))
+            'verification_id': str(student_id) + '_' + str(int(time.time()))
         }), 200
         
     except Exception as e:
@@ -1372,12 +1602,6 @@ def send_otp():
     Send OTP for 2FA verification
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-            import random
-            import string
-        
         data = request.get_json()
         email = data.get('email')
         
@@ -1391,7 +1615,7 @@ def send_otp():
             return jsonify({'error': 'Student not found'}), 404
         
         # Generate 6-digit OTP
-        otp_code = ''.join(random.choices(string.digits, k=6))
+        otp_code = f"{secrets.randbelow(1_000_000):06d}"
         
         # In a real implementation, you would send this via email/SMS
         # For now, we'll just log it
@@ -1416,10 +1640,6 @@ def verify_otp():
     Verify OTP for 2FA
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
         data = request.get_json()
         email = data.get('email')
         otp_code = data.get('otp')
@@ -1437,7 +1657,7 @@ def verify_otp():
         # For now, we'll just check if it's 6 digits
         if len(otp_code) == 6 and otp_code.isdigit():
             # Create JWT tokens
-            claims = {'type': 'student', 'student_id': student.student_id}
+            claims = build_student_claims(student)
             access_token = create_access_token(
                 identity=str(student.student_id),
                 additional_claims=claims
@@ -1470,10 +1690,6 @@ def faculty_login():
     Faculty login endpoint for mobile app
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Faculty, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db, create_access_token
-        
         data = request.get_json()
         email = data.get('email')
         password = data.get('password')
@@ -1493,7 +1709,7 @@ def faculty_login():
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Create JWT tokens
-        claims = {'type': 'faculty', 'faculty_id': faculty.faculty_id}
+        claims = build_faculty_claims(faculty)
         access_token = create_access_token(
             identity=str(faculty.faculty_id),
             additional_claims=claims
@@ -1526,6 +1742,37 @@ def faculty_login():
         logger.error(f"Error during faculty login: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Heartbeats arrive every few seconds but last_seen is only read against the
+# 5-minute ONLINE_WINDOW, so persist it at most once per interval per device
+# (student_id, device_uuid) -> monotonic timestamp of the last last_seen write
+HEARTBEAT_WRITE_INTERVAL_SECONDS = 30
+HEARTBEAT_MAX_ENTRIES = 100000
+_heartbeat_writes = {}
+_heartbeat_writes_lock = threading.Lock()
+
+def _heartbeat_recently_written(student_id, device_uuid):
+    """Check if this device's last_seen was written within HEARTBEAT_WRITE_INTERVAL_SECONDS"""
+    with _heartbeat_writes_lock:
+        written_at = _heartbeat_writes.get((student_id, device_uuid))
+    return written_at is not None and time.monotonic() - written_at < HEARTBEAT_WRITE_INTERVAL_SECONDS
+
+def _mark_heartbeat_written(student_id, device_uuid):
+    """Record a last_seen write, pruning stale entries when the table is full"""
+    now = time.monotonic()
+    with _heartbeat_writes_lock:
+        if len(_heartbeat_writes) >= HEARTBEAT_MAX_ENTRIES:
+            stale = [k for k, v in _heartbeat_writes.items() if now - v >= HEARTBEAT_WRITE_INTERVAL_SECONDS]
+            for k in stale:
+                del _heartbeat_writes[k]
+            if len(_heartbeat_writes) >= HEARTBEAT_MAX_ENTRIES:
+                _heartbeat_writes.clear()
+        _heartbeat_writes[(student_id, device_uuid)] = now
+
+def forget_heartbeat_write(student_id, device_uuid):
+    """Force the next heartbeat for this owner/device to re-check ownership in the DB"""
+    with _heartbeat_writes_lock:
+        _heartbeat_writes.pop((student_id, device_uuid), None)
+
 @mobile_bp.route('/device/heartbeat', methods=['POST'])
 @jwt_required()
 def device_heartbeat():
@@ -1533,10 +1780,6 @@ def device_heartbeat():
     Device heartbeat endpoint for continuous online/offline tracking
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
         # Get current user from JWT token
         claims = get_jwt()
         user_type = claims.get('type')
@@ -1555,29 +1798,24 @@ def device_heartbeat():
             return jsonify({'error': 'Device UUID required'}), 400
         
         # Update device last_seen timestamp
+        is_online = False
         if user_type == 'student':
-            device = StudentDevices.query.filter_by(
-                student_id=user_id,
-                device_uuid=device_uuid
-            ).first()
-        else:
-            # For faculty, we would need a FacultyDevices table
-            # For now, we'll just log the heartbeat
-            device = None
-        
-        if device:
-            device.last_seen = datetime.utcnow()
-            db.session.commit()
-            
-            is_online = True
-        else:
-            is_online = False
+            if _heartbeat_recently_written(user_id, device_uuid):
+                # last_seen was persisted moments ago; the 5-minute online window absorbs the lag
+                is_online = True
+            else:
+                is_online = update_student_device(user_id, device_uuid, {'last_seen': datetime.utcnow()}) > 0
+                db.session.commit()
+                if is_online:
+                    _mark_heartbeat_written(user_id, device_uuid)
+        # For faculty, we would need a FacultyDevices table
+        # For now, we'll just log the heartbeat
         
         return jsonify({
             'success': True,
             'message': 'Heartbeat received',
             'is_online': is_online,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': int(time.time())
         }), 200
         
     except Exception as e:
@@ -1591,10 +1829,6 @@ def log_connectivity_status():
     Log device connectivity status for online/offline tracking
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
         # Get current user from JWT token
         claims = get_jwt()
         user_type = claims.get('type')
@@ -1620,29 +1854,26 @@ def log_connectivity_status():
         
         # Update device information if available
         if user_type == 'student':
-            device = StudentDevices.query.filter_by(
-                student_id=user_id,
-                device_uuid=device_uuid
-            ).first()
+            # Update device info
+            device_updates = {}
+            device_info = data.get('device_info', {})
+            if 'app_version' in device_info:
+                device_updates['app_version'] = device_info['app_version']
+            if 'os_version' in device_info:
+                device_updates['os_version'] = device_info['os_version']
             
-            if device:
-                # Update device info
-                device_info = data.get('device_info', {})
-                if 'app_version' in device_info:
-                    device.app_version = device_info['app_version']
-                if 'os_version' in device_info:
-                    device.os_version = device_info['os_version']
-                
-                # Update last seen for online status
-                if connectivity_status == 'online':
-                    device.last_seen = datetime.utcnow()
-                
+            # Update last seen for online status
+            if connectivity_status == 'online':
+                device_updates['last_seen'] = datetime.utcnow()
+            
+            if device_updates:
+                update_student_device(user_id, device_uuid, device_updates)
                 db.session.commit()
         
         return jsonify({
             'success': True,
             'message': 'Connectivity status logged',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': int(time.time())
         }), 200
         
     except Exception as e:
@@ -1651,57 +1882,60 @@ def log_connectivity_status():
 
 @mobile_bp.route('/student/stats', methods=['GET'])
 @jwt_required()
-def get_student_stats():
+@student_required
+def get_student_stats(student_id):
     """
     Get student attendance statistics
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
-        
-        student_id = claims.get('student_id')
-        
-        # Get all attendance records for this student
-        records = AttendanceRecord.query.filter_by(student_id=student_id).all()
+        # Overall counts per status, aggregated in the database
+        status_counts = dict(
+            db.session.query(AttendanceRecord.status, func.count())
+            .filter(AttendanceRecord.student_id == student_id)
+            .group_by(AttendanceRecord.status)
+            .all()
+        )
         
-        total_classes = len(records)
-        present_count = sum(1 for r in records if r.status == 'present')
-        late_count = sum(1 for r in records if r.status == 'late')
-        absent_count = sum(1 for r in records if r.status == 'absent')
+        total_classes = sum(status_counts.values())
+        present_count = status_counts.get('present', 0)
+        late_count = status_counts.get('late', 0)
+        absent_count = status_counts.get('absent', 0)
         
         # Calculate attendance percentage
         attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
         
         # Get recent attendance (last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_records = AttendanceRecord.query.filter(
-            getattr(AttendanceRecord, 'student_id') == student_id,
-            getattr(AttendanceRecord, 'scan_timestamp') >= thirty_days_ago
-        ).all()
+        recent_counts = dict(
+            db.session.query(AttendanceRecord.status, func.count())
+            .filter(
+                AttendanceRecord.student_id == student_id,
+                AttendanceRecord.scan_timestamp >= thirty_days_ago
+            )
+            .group_by(AttendanceRecord.status)
+            .all()
+        )
         
-        recent_present = sum(1 for r in recent_records if r.status == 'present')
-        recent_total = len(recent_records)
+        recent_present = recent_counts.get('present', 0)
+        recent_total = sum(recent_counts.values())
         recent_percentage = (recent_present / recent_total * 100) if recent_total > 0 else 0
         
-        # Get class-wise statistics
+        # Get class-wise statistics in one joined aggregate
+        class_rows = (
+            db.session.query(Classes.class_name, AttendanceRecord.status, func.count())
+            .join(AttendanceSession, AttendanceSession.session_id == AttendanceRecord.session_id)
+            .join(Classes, Classes.class_id == AttendanceSession.class_id)
+            .filter(AttendanceRecord.student_id == student_id)
+            .group_by(Classes.class_name, AttendanceRecord.status)
+            .all()
+        )
+        
         class_stats = {}
-        for record in records:
-            session = AttendanceSession.query.get(record.session_id)
-            if session:
-                class_obj = Classes.query.get(session.class_id)
-                if class_obj:
-                    class_name = class_obj.class_name
-                    if class_name not in class_stats:
-                        class_stats[class_name] = {'total': 0, 'present': 0}
-                    class_stats[class_name]['total'] += 1
-                    if record.status == 'present':
-                        class_stats[class_name]['present'] += 1
+        for class_name, status, count in class_rows:
+            stats = class_stats.setdefault(class_name, {'total': 0, 'present': 0})
+            stats['total'] += count
+            if status == 'present':
+                stats['present'] += count
         
         # Calculate class-wise percentages
         for class_name, stats in class_stats.items():
@@ -1738,10 +1972,6 @@ def get_student_presence(student_id):
     Get presence status for a specific student
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
         # Get current user from JWT token (faculty or admin can access)
         claims = get_jwt()
         user_type = claims.get('type')
@@ -1750,15 +1980,19 @@ def get_student_presence(student_id):
         if user_type == 'student' and claims.get('student_id') != student_id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get student
-        student = Student.query.get(student_id)
+        # Get student (existence check only)
+        student = db.session.query(Student.student_id).filter(Student.student_id == student_id).first()
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
-        # Get student's devices
-        devices = StudentDevices.query.filter_by(student_id=student_id).all()
+        # Get student's devices as plain rows with just the columns we report
+        devices = db.session.query(
+            StudentDevices.device_id, StudentDevices.device_uuid,
+            StudentDevices.device_name, StudentDevices.last_seen
+        ).filter(StudentDevices.student_id == student_id).all()
         
         # Determine presence status based on last seen
+        online_cutoff = datetime.utcnow() - ONLINE_WINDOW
         presence_status = 'offline'
         last_seen = None
         device_info = []
@@ -1769,7 +2003,7 @@ def get_student_presence(student_id):
                 'device_uuid': device.device_uuid,
                 'device_name': device.device_name,
                 'last_seen': device.last_seen.isoformat() if device.last_seen else None,
-                'is_online': (datetime.utcnow() - device.last_seen).total_seconds() < 300 if device.last_seen else False
+                'is_online': device.last_seen is not None and device.last_seen > online_cutoff
             })
             
             if device.last_seen:
@@ -1777,7 +2011,7 @@ def get_student_presence(student_id):
                     last_seen = device.last_seen
         
         # If seen in last 5 minutes, consider online
-        if last_seen and (datetime.utcnow() - last_seen).total_seconds() < 300:
+        if last_seen and last_seen > online_cutoff:
             presence_status = 'online'
         elif last_seen:
             presence_status = 'away'
@@ -1796,53 +2030,40 @@ def get_student_presence(student_id):
 
 @mobile_bp.route('/presence/all', methods=['GET'])
 @jwt_required()
+@faculty_or_admin_required
 def get_all_presence():
     """
     Get presence status for all students (for faculty/SmartBoard)
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, check_password, db
-        
-        # Get current user from JWT token
-        claims = get_jwt()
-        user_type = claims.get('type')
-        
-        # Only faculty or admin can access all presence
-        if user_type not in ['faculty', 'admin']:
-            return jsonify({'error': 'Access denied'}), 403
+        # Latest device heartbeat and presence status per active student, decided in SQL:
+        # online if seen in last 5 minutes, away if seen earlier, offline if never seen
+        online_cutoff = datetime.utcnow() - ONLINE_WINDOW
+        latest_seen = func.max(StudentDevices.last_seen)
+        presence_expr = case(
+            (latest_seen.is_(None), 'offline'),
+            (latest_seen > online_cutoff, 'online'),
+            else_='away'
+        )
         
-        # Get all active students
-        students = Student.query.filter_by(is_active=True).all()
+        rows = db.session.query(
+            Student.student_id, Student.first_name, Student.last_name, Student.student_code,
+            latest_seen.label('last_seen'), presence_expr.label('presence_status')
+        ).outerjoin(
+            StudentDevices, StudentDevices.student_id == Student.student_id
+        ).filter(
+            Student.is_active == True
+        ).group_by(
+            Student.student_id, Student.first_name, Student.last_name, Student.student_code
+        ).all()
         
-        presence_data = []
-        for student in students:
-            # Get student's devices
-            devices = StudentDevices.query.filter_by(student_id=student.student_id).all()
-            
-            # Determine presence status
-            presence_status = 'offline'
-            last_seen = None
-            
-            for device in devices:
-                if device.last_seen:
-                    if not last_seen or device.last_seen > last_seen:
-                        last_seen = device.last_seen
-            
-            # If seen in last 5 minutes, consider online
-            if last_seen and (datetime.utcnow() - last_seen).total_seconds() < 300:
-                presence_status = 'online'
-            elif last_seen:
-                presence_status = 'away'
-            
-            presence_data.append({
-                'student_id': student.student_id,
-                'student_name': f"{student.first_name} {student.last_name}",
-                'student_code': student.student_code,
-                'presence_status': presence_status,
-                'last_seen': last_seen.isoformat() if last_seen else None
-            })
+        presence_data = [{
+            'student_id': row.student_id,
+            'student_name': f"{row.first_name} {row.last_name}",
+            'student_code': row.student_code,
+            'presence_status': row.presence_status,
+            'last_seen': row.last_seen.isoformat() if row.last_seen else None
+        } for row in rows]
         
         return jsonify({
             'success': True,
@@ -1854,23 +2075,68 @@ def get_all_presence():
         logger.error(f"Error getting all presence: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@mobile_bp.route('/attendance/validate-wifi', methods=['POST'])
+def resolve_session_classroom(session_id):
+    """
+    Resolve session -> class -> classroom in one joined query
+    Returns (classroom_id, None) or (None, error message)
+    """
+    location = db.session.execute(Q_SESSION_CLASSROOM, {'session_id': session_id}).first()
+    if not location:
+        return None, 'Invalid session'
+    
+    if not location.class_id or not location.class_classroom_id:
+        return None, 'Class or classroom not found'
+    
+    if not location.classroom_id:
+        return None, 'Classroom not found'
+    
+    return location.classroom_id, None
+
+# Budgets cover one token-version lookup, the (uncached) session -> classroom
+# join and the classroom WiFi list (skipped while it is cached)
+@mobile_bp.route('/attendance/wifi-filter/<int:session_id>', methods=['GET'])
+@query_budget(3)
 @jwt_required()
-def validate_wifi_network():
+@student_required
+def get_wifi_filter(session_id, student_id):
     """
-    Validate WiFi network against registered classroom networks
+    Get the session classroom's WiFi allowlist so the client can drop
+    non-matching scan results before calling validate-wifi
     """
     try:
-        # Import models within app context
-        with current_app.app_context():
-            from app import Student, StudentDevices, AttendanceRecord, AttendanceSession, Classes, Classroom, WiFiNetwork, check_password, db
+        classroom_id, error = resolve_session_classroom(session_id)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Get current student from JWT token
-        claims = get_jwt()
-        if claims.get('type') != 'student':
-            return jsonify({'error': 'Student access required'}), 403
+        registered_networks = get_classroom_wifi_networks(classroom_id)
         
-        student_id = claims.get('student_id')
+        # Allowlist unchanged since the client's cached copy? Skip encoding it
+        etag = registered_networks['etag']
+        if request.if_none_match.contains_weak(etag):
+            return '', 304
+        
+        response = jsonify({
+            'success': True,
+            'session_id': session_id,
+            'bssids': list(registered_networks['by_bssid']),
+            'ssids': list(registered_networks['by_ssid'])
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
+        
+    except Exception as e:
+        logger.error(f"Error getting WiFi filter: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@mobile_bp.route('/attendance/validate-wifi', methods=['POST'])
+@query_budget(3)
+@jwt_required()
+@student_required
+def validate_wifi_network(student_id):
+    """
+    Validate WiFi network against registered classroom networks
+    """
+    try:
         data = request.get_json()
         
         if not data:
@@ -1883,51 +2149,38 @@ def validate_wifi_network():
         if not wifi_data or not session_id:
             return jsonify({'error': 'WiFi data and session ID required'}), 400
         
-        # Get session
-        session = AttendanceSession.query.get(session_id)
-        if not session:
-            return jsonify({'error': 'Invalid session'}), 400
-        
-        # Get class
-        class_obj = Classes.query.get(session.class_id)
-        if not class_obj or not class_obj.classroom_id:
-            return jsonify({'error': 'Class or classroom not found'}), 400
-        
-        # Get classroom
-        classroom = Classroom.query.get(class_obj.classroom_id)
-        if not classroom:
-            return jsonify({'error': 'Classroom not found'}), 400
+        classroom_id, error = resolve_session_classroom(session_id)
+        if error:
+            return jsonify({'error': error}), 400
         
         # Get registered WiFi networks for this classroom
-        registered_networks = WiFiNetwork.query.filter_by(
-            classroom_id=classroom.classroom_id,
-            is_active=True
-        ).all()
+        registered_networks = get_classroom_wifi_networks(classroom_id)
         
         # Extract WiFi information from request
         current_ssid = wifi_data.get('current_ssid')
         current_bssid = wifi_data.get('current_bssid')
-        
-        # Validate against registered networks
-        is_valid_network = False
-        matched_network = None
-        
-        for network in registered_networks:
-            if (current_ssid and current_ssid == network.ssid) or \
-               (current_bssid and current_bssid == network.bssid):
-                is_valid_network = True
-                matched_network = {
-                    'ssid': network.ssid,
-                    'bssid': network.bssid,
-                    'security_type': network.security_type
-                }
-                break
+        # Drivers report aa:bb:.. or AA-BB-..; stored BSSIDs are canonical
+        lookup_bssid = None
+        if current_bssid:
+            is_valid, error = validate_bssid(current_bssid)
+            if not is_valid:
+                return jsonify({'error': f"Invalid current_bssid: {error}"}), 400
+            lookup_bssid = normalize_mac_address(current_bssid)
+        
+        # BSSID uniquely identifies an access point, so a BSSID hit is definitive;
+        # the SSID index is only consulted when that misses
+        matched_network = lookup_bssid and registered_networks['by_bssid'].get(lookup_bssid)
+        if not matched_network and current_ssid:
+            matched_network = registered_networks['by_ssid'].get(current_ssid)
+        matched_network = matched_network or None
+        
+        is_valid_network = matched_network is not None
         
         return jsonify({
             'success': True,
             'valid': is_valid_network,
             'matched_network': matched_network,
-            'registered_networks_count': len(registered_networks),
+            'registered_networks_count': registered_networks['count'],
             'current_ssid': current_ssid,
             'current_bssid': current_bssid
         }), 200
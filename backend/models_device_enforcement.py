@@ -5,6 +5,8 @@ Import these in your main models.py or app.py
 
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+from validators import normalize_mac_address, validate_bssid
 
 
 class CampusWifiNetworks(db.Model):
@@ -32,6 +34,16 @@ class CampusWifiNetworks(db.Model):
         self.floor = floor
         self.coverage_area = coverage_area
         self.is_active = is_active
+    
+    @validates('bssid')
+    def _normalize_bssid(self, key, bssid):
+        """Store BSSIDs in canonical XX:XX:XX:XX:XX:XX form so lookups compare as-is"""
+        if not bssid:
+            return bssid
+        is_valid, error = validate_bssid(bssid)
+        if not is_valid:
+            raise ValueError(error)
+        return normalize_mac_address(bssid)
 
 
 class DeviceSwitchRequests(db.Model):
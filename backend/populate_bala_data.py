@@ -11,6 +11,22 @@ import json
 
 app = create_app()
 
+STUDENT_CODE = '23N31A6645'
+
+# Short display names for the timetable printout, keyed by subject code
+TIMETABLE_DISPLAY_NAMES = {
+    'R22A0512': 'COMPUTER NETWORKS',
+    'R22A0351': 'ROBOTICS & AUTOMATION',
+    'R22A6602': 'MACHINE LEARNING',
+    'R22A6617': 'DAA',
+    'R22A6702': 'INTRO TO DATA SCIENCE',
+    'R22A0084': 'PSD',
+    'R22ANPAT': 'NEOPAT',
+    'R22A6692': 'APP DEVELOPMENT-1',
+    'R22A6681': 'ML LAB',
+    'R22A0596': 'CN LAB'
+}
+
 def print_header(title):
     print('=' * 80)
     print(f'🔧 {title}')
@@ -20,17 +36,17 @@ def print_section(title):
     print(f'\n📝 {title}')
     print('-' * 60)
 
-def clear_existing_data():
+def clear_existing_data(student_id):
     """Clear existing data for BALA to avoid conflicts"""
     print_section('Clearing existing data for BALA...')
     
     with app.app_context():
         try:
-            # Clear attendance records for student 23N31A6645
-            db.session.execute(text("""
-                DELETE FROM attendance_records 
-                WHERE student_id IN (SELECT student_id FROM students WHERE student_code = '23N31A6645')
-            """))
+            # Clear attendance records for student 23N31A6645 (skipped if the student is missing)
+            if student_id is not None:
+                db.session.execute(text("""
+                    DELETE FROM attendance_records WHERE student_id = :student_id
+                """), {'student_id': student_id})
             
             # Clear timetable for section 5
             db.session.execute(text("DELETE FROM timetable WHERE section_id = 5"))
@@ -132,30 +148,35 @@ def insert_subjects():
         }
     ]
     
+    params = [{
+        'code': subject['subject_code'],
+        'name': subject['subject_name'],
+        'faculty': subject['faculty_name'],
+        'short': subject['short_name'],
+        'credits': subject['credits']
+    } for subject in subjects_data]
+    
     with app.app_context():
-        for subject in subjects_data:
-            try:
-                db.session.execute(text("""
-                    INSERT INTO subjects (subject_code, subject_name, faculty_name, short_name, credits, department, created_at)
-                    VALUES (:code, :name, :faculty, :short, :credits, 'CSE', NOW())
-                    ON DUPLICATE KEY UPDATE
-                    subject_name = VALUES(subject_name),
-                    faculty_name = VALUES(faculty_name),
-                    short_name = VALUES(short_name),
-                    credits = VALUES(credits),
-                    department = VALUES(department)
-                """), {
-                    'code': subject['subject_code'],
-                    'name': subject['subject_name'],
-                    'faculty': subject['faculty_name'],
-                    'short': subject['short_name'],
-                    'credits': subject['credits']
-                })
-                print(f'✅ {subject["subject_name"]} ({subject["subject_code"]})')
-            except Exception as e:
-                print(f'❌ Error inserting {subject["subject_code"]}: {e}')
+        try:
+            # One executemany instead of a round trip per subject
+            db.session.execute(text("""
+                INSERT INTO subjects (subject_code, subject_name, faculty_name, short_name, credits, department, created_at)
+                VALUES (:code, :name, :faculty, :short, :credits, 'CSE', NOW())
+                ON DUPLICATE KEY UPDATE
+                subject_name = VALUES(subject_name),
+                faculty_name = VALUES(faculty_name),
+                short_name = VALUES(short_name),
+                credits = VALUES(credits),
+                department = VALUES(department)
+            """), params)
+        except Exception as e:
+            print(f'❌ Error inserting subjects: {e}')
+            db.session.rollback()
+            return
         
         db.session.commit()
+        for subject in subjects_data:
+            print(f'✅ {subject["subject_name"]} ({subject["subject_code"]})')
         print(f'✅ Successfully inserted {len(subjects_data)} subjects')
 
 def insert_complete_timetable():
@@ -200,119 +221,100 @@ def insert_complete_timetable():
         'SATURDAY': ['IDS', 'AD-1', 'BREAK', 'AD-1', 'LUNCH BREAK', 'ML', 'PSD']
     }
     
-    with app.app_context():
-        slot_id = 1
-        total_inserted = 0
+    rows = []
+    for day, subjects in weekly_schedule.items():
+        print(f'  📅 {day}:')
         
-        for day, subjects in weekly_schedule.items():
-            print(f'  📅 {day}:')
+        for slot_num, (start_time, end_time) in enumerate(time_slots, 1):
+            subject_abbr = subjects[slot_num - 1] if slot_num - 1 < len(subjects) else 'FREE'
+            subject_code = subject_mapping.get(subject_abbr)
+            
+            # Determine slot type
+            if subject_abbr in ['BREAK', 'LUNCH BREAK']:
+                slot_type = 'break'
+            elif subject_abbr == 'FREE':
+                slot_type = 'free'
+            else:
+                slot_type = 'regular'
+            
+            rows.append({
+                'day': day,
+                'slot_num': slot_num,
+                'start_time': start_time,
+                'end_time': end_time,
+                'subject_code': subject_code,
+                'slot_type': slot_type
+            })
             
-            for slot_num, (start_time, end_time) in enumerate(time_slots, 1):
-                subject_abbr = subjects[slot_num - 1] if slot_num - 1 < len(subjects) else 'FREE'
-                subject_code = subject_mapping.get(subject_abbr)
-                
-                # Determine slot type
-                if subject_abbr in ['BREAK', 'LUNCH BREAK']:
-                    slot_type = 'break'
-                elif subject_abbr == 'FREE':
-                    slot_type = 'free'
-                else:
-                    slot_type = 'regular'
-                
-                try:
-                    db.session.execute(text("""
-                        INSERT INTO timetable (section_id, day_of_week, slot_number, start_time, end_time, 
-                                             subject_code, slot_type, room_number, created_at)
-                        VALUES (5, :day, :slot_num, :start_time, :end_time, :subject_code, :slot_type, '4208', NOW())
-                    """), {
-                        'day': day,
-                        'slot_num': slot_num,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'subject_code': subject_code,
-                        'slot_type': slot_type
-                    })
-                    
-                    if subject_code:
-                        subject_name = [s for s in [
-                            {'code': 'R22A0512', 'name': 'COMPUTER NETWORKS'},
-                            {'code': 'R22A0351', 'name': 'ROBOTICS & AUTOMATION'},
-                            {'code': 'R22A6602', 'name': 'MACHINE LEARNING'},
-                            {'code': 'R22A6617', 'name': 'DAA'},
-                            {'code': 'R22A6702', 'name': 'INTRO TO DATA SCIENCE'},
-                            {'code': 'R22A0084', 'name': 'PSD'},
-                            {'code': 'R22ANPAT', 'name': 'NEOPAT'},
-                            {'code': 'R22A6692', 'name': 'APP DEVELOPMENT-1'},
-                            {'code': 'R22A6681', 'name': 'ML LAB'},
-                            {'code': 'R22A0596', 'name': 'CN LAB'}
-                        ] if s['code'] == subject_code]
-                        
-                        display_name = subject_name[0]['name'] if subject_name else subject_abbr
-                        print(f'    {start_time}-{end_time}: {display_name}')
-                    else:
-                        print(f'    {start_time}-{end_time}: {subject_abbr}')
-                    
-                    total_inserted += 1
-                    
-                except Exception as e:
-                    print(f'❌ Error inserting {day} slot {slot_num}: {e}')
+            display_name = TIMETABLE_DISPLAY_NAMES.get(subject_code, subject_abbr)
+            print(f'    {start_time}-{end_time}: {display_name}')
+    
+    with app.app_context():
+        try:
+            # All slots for the week in one executemany
+            db.session.execute(text("""
+                INSERT INTO timetable (section_id, day_of_week, slot_number, start_time, end_time, 
+                                     subject_code, slot_type, room_number, created_at)
+                VALUES (5, :day, :slot_num, :start_time, :end_time, :subject_code, :slot_type, '4208', NOW())
+            """), rows)
+        except Exception as e:
+            print(f'❌ Error inserting timetable: {e}')
+            db.session.rollback()
+            return
         
         db.session.commit()
-        print(f'✅ Successfully inserted {total_inserted} timetable entries')
+        print(f'✅ Successfully inserted {len(rows)} timetable entries')
 
-def insert_attendance_data():
+def get_student_id():
+    """Look up BALA's student_id once; None if the student row does not exist"""
+    with app.app_context():
+        return db.session.execute(text("""
+            SELECT student_id FROM students WHERE student_code = :code
+        """), {'code': STUDENT_CODE}).scalar()
+
+def insert_attendance_data(student_id):
     """Insert realistic attendance data based on the percentages shown"""
     print_section('Inserting Attendance Data...')
     
     # For now, let's create some mock session data and attendance records
     # Based on the actual schema: attendance_records uses session_id, not subject_code
     
+    # Create some mock attendance records
+    attendance_data = [
+        {'date': '2025-09-20', 'status': 'present'},
+        {'date': '2025-09-21', 'status': 'present'},
+        {'date': '2025-09-22', 'status': 'late'},
+        {'date': '2025-09-23', 'status': 'present'},
+        {'date': '2025-09-24', 'status': 'absent'},
+        {'date': '2025-09-25', 'status': 'present'},
+    ]
+    
+    params = [{
+        'student_id': student_id,
+        'timestamp': f"{record['date']} 10:00:00",
+        'status': record['status']
+    } for record in attendance_data]
+    
     with app.app_context():
-        # Get student ID
-        student = db.session.execute(text("""
-            SELECT student_id FROM students WHERE student_code = '23N31A6645'
-        """)).fetchone()
-        
-        if not student:
-            print('❌ Student not found')
-            return
-        
-        student_id = student.student_id
-        total_records = 0
-        
         # Insert some basic attendance records without session_id for now
         # We'll need to create a proper session management system later
         try:
-            # Create some mock attendance records
-            attendance_data = [
-                {'date': '2025-09-20', 'status': 'present'},
-                {'date': '2025-09-21', 'status': 'present'},
-                {'date': '2025-09-22', 'status': 'late'},
-                {'date': '2025-09-23', 'status': 'present'},
-                {'date': '2025-09-24', 'status': 'absent'},
-                {'date': '2025-09-25', 'status': 'present'},
-            ]
-            
-            for record in attendance_data:
-                # Create a dummy session_id (you'll need proper session management)
-                db.session.execute(text("""
-                    INSERT INTO attendance_records (session_id, student_id, scan_timestamp, status, 
-                                                   biometric_verified, location_verified, bluetooth_verified,
-                                                   verification_score, created_at, updated_at)
-                    VALUES (1, :student_id, :timestamp, :status, 1, 1, 1, 0.95, NOW(), NOW())
-                """), {
-                    'student_id': student_id,
-                    'timestamp': f"{record['date']} 10:00:00",
-                    'status': record['status']
-                })
-                total_records += 1
-                print(f"  ✅ {record['date']}: {record['status'].upper()}")
-                
+            # Create a dummy session_id (you'll need proper session management)
+            db.session.execute(text("""
+                INSERT INTO attendance_records (session_id, student_id, scan_timestamp, status, 
+                                               biometric_verified, location_verified, bluetooth_verified,
+                                               verification_score, created_at, updated_at)
+                VALUES (1, :student_id, :timestamp, :status, 1, 1, 1, 0.95, NOW(), NOW())
+            """), params)
+            db.session.commit()
         except Exception as e:
             print(f'❌ Error inserting attendance records: {e}')
+            db.session.rollback()
+            return
         
-        db.session.commit()
-        print(f'✅ Successfully inserted {total_records} attendance records')
+        for record in attendance_data:
+            print(f"  ✅ {record['date']}: {record['status'].upper()}")
+        print(f'✅ Successfully inserted {len(params)} attendance records')
 
 def update_student_details():
     """Update BALA's complete student details"""
@@ -336,35 +338,26 @@ def update_student_details():
             
         except Exception as e:
             print(f'❌ Error updating student details: {e}')
+            db.session.rollback()
 
-def generate_attendance_statistics():
+def generate_attendance_statistics(student_id):
     """Generate and display attendance statistics"""
     print_section('Generating Attendance Statistics...')
     
     with app.app_context():
         try:
-            student = db.session.execute(text("""
-                SELECT student_id FROM students WHERE student_code = '23N31A6645'
-            """)).fetchone()
-            
-            if not student:
-                print('❌ Student not found')
-                return
-            
-            student_id = student.student_id
-            
             # Calculate overall attendance from existing records
             overall_stats = db.session.execute(text("""
                 SELECT 
                     COUNT(*) as total_sessions,
-                    SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present_sessions
+                    SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present_sessions,
+                    SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) * 100.0 / NULLIF(COUNT(*), 0) as overall_percentage
                 FROM attendance_records 
                 WHERE student_id = :student_id
             """), {'student_id': student_id}).fetchone()
             
             if overall_stats and overall_stats.total_sessions > 0:
-                overall_percentage = (overall_stats.present_sessions / overall_stats.total_sessions) * 100
-                print(f'✅ Overall Attendance: {overall_percentage:.2f}% ({overall_stats.present_sessions}/{overall_stats.total_sessions})')
+                print(f'✅ Overall Attendance: {overall_stats.overall_percentage:.2f}% ({overall_stats.present_sessions}/{overall_stats.total_sessions})')
             else:
                 print('ℹ️ No attendance records found for statistics')
             
@@ -384,8 +377,14 @@ def main():
     print()
     
     try:
+        # Subjects and timetable do not depend on the student; only the
+        # attendance steps are skipped when the student row is missing
+        student_id = get_student_id()
+        if student_id is None:
+            print(f'⚠️  Student {STUDENT_CODE} not found - skipping attendance data')
+        
         # Step 1: Clear existing data
-        clear_existing_data()
+        clear_existing_data(student_id)
         
         # Step 2: Insert subjects
         insert_subjects()
@@ -396,11 +395,15 @@ def main():
         # Step 4: Update student details
         update_student_details()
         
+        if student_id is None:
+            print_header('⚠️  SUBJECTS AND TIMETABLE POPULATED - ATTENDANCE SKIPPED')
+            return
+        
         # Step 5: Insert attendance data
-        insert_attendance_data()
+        insert_attendance_data(student_id)
         
         # Step 6: Generate statistics
-        generate_attendance_statistics()
+        generate_attendance_statistics(student_id)
         
         # Final verification
         print_header('✅ DATABASE POPULATION COMPLETED SUCCESSFULLY!')
@@ -412,8 +415,8 @@ def main():
                        (SELECT COUNT(*) FROM timetable WHERE section_id = s.section_id) as timetable_entries,
                        (SELECT COUNT(*) FROM subjects WHERE subject_code LIKE 'R22%') as subjects_count,
                        (SELECT COUNT(*) FROM attendance_records WHERE student_id = s.student_id) as attendance_records
-                FROM students s WHERE s.student_code = '23N31A6645'
-            """)).fetchone()
+                FROM students s WHERE s.student_id = :student_id
+            """), {'student_id': student_id}).fetchone()
             
             if student_check:
                 print(f'🎓 Student: {student_check.first_name} {student_check.last_name} ({student_check.student_code})')
@@ -6,17 +6,18 @@ to enable testing of all IntelliAttend features.
 """
 
 from app import create_app, db
-from sqlalchemy import text
-import random
-import hashlib
+from sqlalchemy import text, bindparam
+import argparse
+import secrets
+import numpy as np
 from datetime import datetime, timedelta, time as dt_time
-import uuid
 
 app = create_app()
 
-def generate_qr_token():
-    """Generate a unique QR token"""
-    return hashlib.sha256(str(uuid.uuid4()).encode()).hexdigest()[:32]
+def generate_qr_tokens(count):
+    """Generate count unique 32-hex-char QR tokens from a single entropy draw"""
+    raw = secrets.token_bytes(count * 16)
+    return [raw[i:i + 16].hex() for i in range(0, count * 16, 16)]
 
 def print_header(title):
     print('\n' + '=' * 80)
@@ -125,6 +126,12 @@ SUBJECTS_DATA = [
     }
 ]
 
+# Target attendance percentage per subject code
+ATTENDANCE_TARGET_BY_CODE = {subj['code']: subj['attendance_target'] for subj in SUBJECTS_DATA}
+
+# WEEKLY_SCHEDULE keys indexed by date.weekday()
+DAY_NAMES = ('MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY')
+
 # Weekly timetable structure
 WEEKLY_SCHEDULE = {
     'MONDAY': [
@@ -169,169 +176,217 @@ WEEKLY_SCHEDULE = {
     ]
 }
 
-def populate_attendance_sessions_and_records():
+# Parse slot times once so session generation only combines them with dates
+for day_slots in WEEKLY_SCHEDULE.values():
+    for class_slot in day_slots:
+        class_slot['time'] = tuple(dt_time.fromisoformat(t) for t in class_slot['time'])
+
+# Statements for the bulk attendance phase, built once at import
+INSERT_SESSION_SQL = text("""
+    INSERT INTO attendance_sessions 
+    (class_id, faculty_id, session_date, start_time, end_time, 
+     qr_token, qr_secret_key, qr_expires_at, status, total_students_enrolled, 
+     total_students_present, attendance_percentage, created_at, updated_at)
+    VALUES (:class_id, 1, :session_date, :start_time, :end_time,
+            :qr_token, :qr_secret, :qr_expires, 'completed', 65,
+            1, 1.54, NOW(), NOW())
+""")
+
+SELECT_SESSION_IDS_SQL = text(
+    "SELECT qr_token, session_id FROM attendance_sessions WHERE class_id = :cid"
+)
+
+INSERT_RECORD_SQL = text("""
+    INSERT INTO attendance_records 
+    (session_id, student_id, scan_timestamp, status, 
+     biometric_verified, location_verified, bluetooth_verified,
+     gps_latitude, gps_longitude, gps_accuracy,
+     verification_score, notes, created_at, updated_at)
+    VALUES (:session_id, :student_id, :scan_time, :status,
+            :verified, :verified, :verified, :lat, :lng, :accuracy,
+            :score, :notes, NOW(), NOW())
+""")
+
+def populate_attendance_sessions_and_records(truncate=False, student_id=None, class_id=None, force=False):
     """
     Create comprehensive attendance sessions and records for the past 2 months
     This will generate realistic attendance data matching the percentages from images
+    
+    Args:
+        truncate: Empty both attendance tables with TRUNCATE instead of deleting
+                  this student's/class's rows (seed-only databases)
+        student_id: Known student_id; skips the lookup by student code
+        class_id: Known class_id; skips the class name search
+        force: Regenerate even if the class already has seeded sessions
     """
     print_section('Creating Comprehensive Attendance Data')
     
     with app.app_context():
-        # Get student and class info
-        student = db.session.execute(text(
-            "SELECT student_id FROM students WHERE student_code = '23N31A6645'"
-        )).fetchone()
-        
-        if not student:
-            print('❌ Student not found! Please ensure student exists.')
-            return
+        # Get student and class info (unless given on the command line)
+        if student_id is None:
+            student = db.session.execute(text(
+                "SELECT student_id FROM students WHERE student_code = '23N31A6645'"
+            )).fetchone()
+            
+            if not student:
+                print('❌ Student not found! Please ensure student exists.')
+                return
+            
+            student_id = student.student_id
         
-        student_id = student.student_id
+        if class_id is None:
+            # Get class_id for CSE AIML Section A (substring match - scans classes)
+            class_info = db.session.execute(text(
+                "SELECT class_id FROM classes WHERE class_name LIKE '%Section A%' LIMIT 1"
+            )).fetchone()
+            
+            if not class_info:
+                print('❌ Class not found! Using default class_id = 1')
+                class_id = 1
+            else:
+                class_id = class_info.class_id
         
-        # Get class_id for CSE AIML Section A
-        class_info = db.session.execute(text(
-            "SELECT class_id FROM classes WHERE class_name LIKE '%Section A%' LIMIT 1"
-        )).fetchone()
-        
-        if not class_info:
-            print('❌ Class not found! Using default class_id = 1')
-            class_id = 1
-        else:
-            class_id = class_info.class_id
+        # Already seeded for this student in this class? Re-runs (e.g. CI retries)
+        # skip the clear + bulk load; sessions alone could belong to another student
+        if not (force or truncate):
+            already_seeded = db.session.execute(text("""
+                SELECT 1 FROM attendance_records ar
+                JOIN attendance_sessions s ON s.session_id = ar.session_id
+                WHERE s.class_id = :cid AND ar.student_id = :sid
+                LIMIT 1
+            """), {'cid': class_id, 'sid': student_id}).first()
+            if already_seeded:
+                print('ℹ️  Attendance data already seeded for this student and class - use --force to regenerate')
+                return
         
         # Clear existing sessions and attendance for clean data
-        print('🗑️  Clearing old attendance data...')
-        db.session.execute(text("DELETE FROM attendance_records WHERE student_id = :sid"), 
-                          {'sid': student_id})
-        db.session.execute(text("DELETE FROM attendance_sessions WHERE class_id = :cid"), 
-                          {'cid': class_id})
+        if truncate:
+            # TRUNCATE drops every row without per-row undo/binlog writes, for ALL students
+            print('🗑️  Truncating attendance tables...')
+            db.session.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+            try:
+                db.session.execute(text("TRUNCATE TABLE attendance_records"))
+                db.session.execute(text("TRUNCATE TABLE attendance_sessions"))
+            finally:
+                db.session.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+        else:
+            print('🗑️  Clearing old attendance data...')
+            db.session.execute(text("DELETE FROM attendance_records WHERE student_id = :sid"), 
+                              {'sid': student_id})
+            db.session.execute(text("DELETE FROM attendance_sessions WHERE class_id = :cid"), 
+                              {'cid': class_id})
         db.session.commit()
         
         # Generate sessions for past 8 weeks (September-October 2025)
         start_date = datetime(2025, 9, 1)
         end_date = datetime(2025, 10, 26)
-        current_date = start_date
         
-        total_sessions_created = 0
-        total_attendance_records = 0
+        session_rows = []
+        record_rows = []
         subject_session_counts = {subj['code']: {'total': 0, 'present': 0} for subj in SUBJECTS_DATA}
         
         print(f'\n📅 Generating sessions from {start_date.date()} to {end_date.date()}')
         
-        while current_date <= end_date:
-            day_name = current_date.strftime('%A').upper()
+        # Flatten the date range into the class slots to generate
+        all_slots = []
+        for day_offset in range((end_date - start_date).days + 1):
+            current_date = start_date + timedelta(days=day_offset)
+            day_schedule = WEEKLY_SCHEDULE.get(DAY_NAMES[current_date.weekday()], [])
+            all_slots.extend((current_date.date(), class_slot) for class_slot in day_schedule)
+        
+        slot_count = len(all_slots)
+        
+        # Session start/end/QR-expiry datetimes for every slot in one pass each
+        start_datetimes = [datetime.combine(d, slot['time'][0]) for d, slot in all_slots]
+        end_datetimes = [datetime.combine(d, slot['time'][1]) for d, slot in all_slots]
+        qr_expiries = [end + timedelta(hours=2) for end in end_datetimes]
+        
+        # QR token and secret per session, generated in one batch
+        qr_values = generate_qr_tokens(slot_count * 2)
+        
+        # Draw every random value up front, one vectorized call per kind
+        rng = np.random.default_rng()
+        late_draws = rng.random(slot_count).tolist()
+        scan_offsets = rng.integers(-5, 16, slot_count).tolist()
+        scores = np.round(rng.uniform(0.90, 0.99, slot_count), 2).tolist()
+        
+        # Mark exactly round(sessions * target%) of each subject's sessions present,
+        # in shuffled order, so the generated percentages hit the targets
+        slots_by_subject = {}
+        for i, (_, class_slot) in enumerate(all_slots):
+            slots_by_subject.setdefault(class_slot['subject'], []).append(i)
+        
+        presence = [False] * slot_count
+        for subject_code, indices in slots_by_subject.items():
+            target_percentage = ATTENDANCE_TARGET_BY_CODE.get(subject_code, 80.0)
+            mask = np.zeros(len(indices), dtype=bool)
+            mask[:round(len(indices) * target_percentage / 100)] = True
+            rng.shuffle(mask)
+            for i, is_present in zip(indices, mask.tolist()):
+                presence[i] = is_present
+            subject_session_counts[subject_code] = {'total': len(indices), 'present': int(mask.sum())}
+        
+        # Build every session/record row first; they are written in two executemany calls below
+        for i, (session_date, _) in enumerate(all_slots):
+            start_datetime = start_datetimes[i]
             
-            # Skip if not a weekday with classes
-            if day_name not in WEEKLY_SCHEDULE:
-                current_date += timedelta(days=1)
-                continue
+            qr_token = qr_values[2 * i]
+            qr_secret = qr_values[2 * i + 1]
             
-            # Get schedule for this day
-            day_schedule = WEEKLY_SCHEDULE[day_name]
+            session_rows.append({
+                'class_id': class_id,
+                'session_date': session_date,
+                'start_time': start_datetime,
+                'end_time': end_datetimes[i],
+                'qr_token': qr_token,
+                'qr_secret': qr_secret,
+                'qr_expires': qr_expiries[i]
+            })
             
-            for class_slot in day_schedule:
-                subject_code = class_slot['subject']
-                start_time_str, end_time_str = class_slot['time']
-                
-                # Create session
-                session_date = current_date.date()
-                start_datetime = datetime.combine(session_date, 
-                                                 datetime.strptime(start_time_str, '%H:%M').time())
-                end_datetime = datetime.combine(session_date, 
-                                               datetime.strptime(end_time_str, '%H:%M').time())
-                
-                qr_token = generate_qr_token()
-                qr_secret = generate_qr_token()
-                
-                # Insert session
-                result = db.session.execute(text("""
-                    INSERT INTO attendance_sessions 
-                    (class_id, faculty_id, session_date, start_time, end_time, 
-                     qr_token, qr_secret_key, qr_expires_at, status, total_students_enrolled, 
-                     created_at, updated_at)
-                    VALUES (:class_id, 1, :session_date, :start_time, :end_time,
-                            :qr_token, :qr_secret, :qr_expires, 'completed', 65,
-                            NOW(), NOW())
-                """), {
-                    'class_id': class_id,
-                    'session_date': session_date,
-                    'start_time': start_datetime,
-                    'end_time': end_datetime,
+            if presence[i]:
+                # Randomly decide: present or late
+                record_rows.append({
                     'qr_token': qr_token,
-                    'qr_secret': qr_secret,
-                    'qr_expires': end_datetime + timedelta(hours=2)
+                    'student_id': student_id,
+                    'scan_time': start_datetime + timedelta(minutes=scan_offsets[i]),
+                    'status': 'present' if late_draws[i] > 0.05 else 'late',
+                    'verified': 1,
+                    'lat': 17.3850, 'lng': 78.4867, 'accuracy': 15.5,
+                    'score': scores[i],
+                    'notes': None
                 })
-                
-                session_id = result.lastrowid
-                total_sessions_created += 1
-                subject_session_counts[subject_code]['total'] += 1
-                
-                # Determine if student was present based on target attendance percentage
-                subject_data = next((s for s in SUBJECTS_DATA if s['code'] == subject_code), None)
-                target_percentage = subject_data['attendance_target'] if subject_data else 80.0
-                
-                # Add some randomness but maintain overall percentage
-                is_present = random.random() * 100 < target_percentage
-                
-                if is_present:
-                    # Randomly decide: present or late
-                    status = 'present' if random.random() > 0.05 else 'late'
-                    scan_time = start_datetime + timedelta(minutes=random.randint(-5, 15))
-                    verification_score = round(random.uniform(0.90, 0.99), 2)
-                    subject_session_counts[subject_code]['present'] += 1
-                else:
-                    # Absent
-                    status = 'absent'
-                    scan_time = None
-                    verification_score = 0.0
-                
-                # Create attendance record
-                if scan_time:
-                    db.session.execute(text("""
-                        INSERT INTO attendance_records 
-                        (session_id, student_id, scan_timestamp, status, 
-                         biometric_verified, location_verified, bluetooth_verified,
-                         gps_latitude, gps_longitude, gps_accuracy,
-                         verification_score, created_at, updated_at)
-                        VALUES (:session_id, :student_id, :scan_time, :status,
-                                1, 1, 1, 17.3850, 78.4867, 15.5,
-                                :score, NOW(), NOW())
-                    """), {
-                        'session_id': session_id,
-                        'student_id': student_id,
-                        'scan_time': scan_time,
-                        'status': status,
-                        'score': verification_score
-                    })
-                else:
-                    # Record absence
-                    db.session.execute(text("""
-                        INSERT INTO attendance_records 
-                        (session_id, student_id, scan_timestamp, status, 
-                         biometric_verified, location_verified, bluetooth_verified,
-                         verification_score, notes, created_at, updated_at)
-                        VALUES (:session_id, :student_id, :scan_time, 'absent',
-                                0, 0, 0, 0.0, 'Did not scan QR code', NOW(), NOW())
-                    """), {
-                        'session_id': session_id,
-                        'student_id': student_id,
-                        'scan_time': start_datetime
-                    })
-                
-                total_attendance_records += 1
-                
-                # Update session statistics
-                db.session.execute(text("""
-                    UPDATE attendance_sessions 
-                    SET total_students_present = 1,
-                        attendance_percentage = 1.54
-                    WHERE session_id = :session_id
-                """), {'session_id': session_id})
-            
-            current_date += timedelta(days=1)
+            else:
+                # Record absence
+                record_rows.append({
+                    'qr_token': qr_token,
+                    'student_id': student_id,
+                    'scan_time': start_datetime,
+                    'status': 'absent',
+                    'verified': 0,
+                    'lat': None, 'lng': None, 'accuracy': None,
+                    'score': 0.0,
+                    'notes': 'Did not scan QR code'
+                })
+        
+        # Insert sessions (statistics are constant for this single-student data set)
+        db.session.execute(INSERT_SESSION_SQL, session_rows)
+        
+        # executemany gives no per-row ids; map them back by the unique QR token
+        session_ids = dict(db.session.execute(SELECT_SESSION_IDS_SQL, {'cid': class_id}).all())
+        for record in record_rows:
+            record['session_id'] = session_ids[record.pop('qr_token')]
+        
+        # Insert attendance records
+        db.session.execute(INSERT_RECORD_SQL, record_rows)
         
         db.session.commit()
         
+        # Refresh optimizer statistics after the bulk load
+        db.session.execute(text("ANALYZE TABLE attendance_sessions, attendance_records"))
+        
+        total_sessions_created = len(session_rows)
+        total_attendance_records = len(record_rows)
+        
         print(f'\n✅ Created {total_sessions_created} attendance sessions')
         print(f'✅ Created {total_attendance_records} attendance records')
         
@@ -362,82 +417,76 @@ def create_faculty_data():
             {'name': 'VAMSI', 'email': 'vamsi@mrcet.ac.in', 'dept': 'CSE'},
         ]
         
-        for faculty in faculty_list:
-            try:
-                # Check if faculty exists
-                existing = db.session.execute(text(
-                    "SELECT COUNT(*) as c FROM faculty WHERE email = :email"
-                ), {'email': faculty['email']}).fetchone()
-                
-                if existing.c == 0:
-                    db.session.execute(text("""
-                        INSERT INTO faculty (first_name, last_name, email, department, created_at)
-                        VALUES (:first_name, :last_name, :email, :dept, NOW())
-                    """), {
-                        'first_name': faculty['name'].split()[0],
-                        'last_name': ' '.join(faculty['name'].split()[1:]),
-                        'email': faculty['email'],
-                        'dept': faculty['dept']
-                    })
-                    print(f"  ✅ Created faculty: {faculty['name']}")
-            except Exception as e:
-                print(f"  ⚠️  Could not create faculty {faculty['name']}: {e}")
-        
-        db.session.commit()
+        try:
+            # One membership query for all emails instead of a COUNT per faculty
+            existing_query = text(
+                "SELECT email FROM faculty WHERE email IN :emails"
+            ).bindparams(bindparam('emails', expanding=True))
+            existing = set(db.session.execute(
+                existing_query, {'emails': [faculty['email'] for faculty in faculty_list]}
+            ).scalars())
+            
+            new_faculty = [faculty for faculty in faculty_list if faculty['email'] not in existing]
+            if new_faculty:
+                db.session.execute(text("""
+                    INSERT INTO faculty (first_name, last_name, email, department, created_at)
+                    VALUES (:first_name, :last_name, :email, :dept, NOW())
+                """), [{
+                    'first_name': faculty['name'].split()[0],
+                    'last_name': ' '.join(faculty['name'].split()[1:]),
+                    'email': faculty['email'],
+                    'dept': faculty['dept']
+                } for faculty in new_faculty])
+            
+            db.session.commit()
+            for faculty in new_faculty:
+                print(f"  ✅ Created faculty: {faculty['name']}")
+            print(f"  ℹ️  {len(existing)} faculty already present")
+        except Exception as e:
+            db.session.rollback()
+            print(f"  ⚠️  Could not create faculty: {e}")
 
 def verify_all_data():
     """Final verification of all populated data"""
     print_header('📊 FINAL DATA VERIFICATION')
     
     with app.app_context():
-        # Student verification
-        student = db.session.execute(text("""
-            SELECT first_name, last_name, student_code, email, program, year_of_study
-            FROM students WHERE student_code = '23N31A6645'
+        # Student, catalogue counts and this student's attendance aggregate in one round trip
+        summary = db.session.execute(text("""
+            SELECT s.first_name, s.last_name, s.student_code, s.email, s.program, s.year_of_study,
+                   (SELECT COUNT(*) FROM subjects WHERE subject_code LIKE 'R22%') as subjects_count,
+                   (SELECT COUNT(*) FROM timetable WHERE section_id = 5) as timetable_count,
+                   (SELECT COUNT(*) FROM attendance_sessions) as sessions_count,
+                   COUNT(ar.record_id) as total,
+                   SUM(CASE WHEN ar.status = 'present' THEN 1 ELSE 0 END) as present,
+                   SUM(CASE WHEN ar.status = 'late' THEN 1 ELSE 0 END) as late,
+                   SUM(CASE WHEN ar.status = 'absent' THEN 1 ELSE 0 END) as absent,
+                   ROUND(SUM(CASE WHEN ar.status IN ('present', 'late') THEN 1 ELSE 0 END) * 100.0
+                         / NULLIF(COUNT(ar.record_id), 0), 2) as percentage
+            FROM students s
+            LEFT JOIN attendance_records ar ON ar.student_id = s.student_id
+            WHERE s.student_code = '23N31A6645'
+            GROUP BY s.student_id, s.first_name, s.last_name, s.student_code, s.email,
+                     s.program, s.year_of_study
         """)).fetchone()
         
         print(f'\n👤 STUDENT INFORMATION:')
-        print(f'   Name: {student.first_name} {student.last_name}')
-        print(f'   Student Code: {student.student_code}')
-        print(f'   Email: {student.email}')
-        print(f'   Program: {student.program}')
-        print(f'   Year: {student.year_of_study}')
-        
-        # Subjects verification
-        subjects = db.session.execute(text("""
-            SELECT COUNT(*) as count FROM subjects WHERE subject_code LIKE 'R22%'
-        """)).fetchone()
-        print(f'\n📚 SUBJECTS: {subjects.count} subjects registered')
+        print(f'   Name: {summary.first_name} {summary.last_name}')
+        print(f'   Student Code: {summary.student_code}')
+        print(f'   Email: {summary.email}')
+        print(f'   Program: {summary.program}')
+        print(f'   Year: {summary.year_of_study}')
         
-        # Timetable verification
-        timetable = db.session.execute(text("""
-            SELECT COUNT(*) as count FROM timetable WHERE section_id = 5
-        """)).fetchone()
-        print(f'\n⏰ TIMETABLE: {timetable.count} slots scheduled')
-        
-        # Attendance sessions verification
-        sessions = db.session.execute(text("""
-            SELECT COUNT(*) as count FROM attendance_sessions
-        """)).fetchone()
-        print(f'\n📅 ATTENDANCE SESSIONS: {sessions.count} sessions created')
-        
-        # Attendance records verification
-        attendance = db.session.execute(text("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present,
-                SUM(CASE WHEN status = 'late' THEN 1 ELSE 0 END) as late,
-                SUM(CASE WHEN status = 'absent' THEN 1 ELSE 0 END) as absent,
-                ROUND(SUM(CASE WHEN status IN ('present', 'late') THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 2) as percentage
-            FROM attendance_records WHERE student_id = 2
-        """)).fetchone()
+        print(f'\n📚 SUBJECTS: {summary.subjects_count} subjects registered')
+        print(f'\n⏰ TIMETABLE: {summary.timetable_count} slots scheduled')
+        print(f'\n📅 ATTENDANCE SESSIONS: {summary.sessions_count} sessions created')
         
         print(f'\n📊 ATTENDANCE RECORDS:')
-        print(f'   Total: {attendance.total}')
-        print(f'   Present: {attendance.present}')
-        print(f'   Late: {attendance.late}')
-        print(f'   Absent: {attendance.absent}')
-        print(f'   Overall Percentage: {attendance.percentage}%')
+        print(f'   Total: {summary.total}')
+        print(f'   Present: {summary.present}')
+        print(f'   Late: {summary.late}')
+        print(f'   Absent: {summary.absent}')
+        print(f'   Overall Percentage: {summary.percentage}%')
         
         # Faculty verification
         try:
@@ -472,6 +521,18 @@ def verify_all_data():
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description='Populate IntelliAttend test data for BALA (23N31A6645)')
+    parser.add_argument('--truncate', action='store_true',
+                        help='TRUNCATE attendance_records/attendance_sessions instead of a scoped DELETE '
+                             '(wipes attendance for every student - seed-only databases)')
+    parser.add_argument('--force', action='store_true',
+                        help='Regenerate attendance data even if the class is already seeded')
+    parser.add_argument('--student-id', type=int,
+                        help='student_id to populate (skips the lookup by student code)')
+    parser.add_argument('--class-id', type=int,
+                        help='class_id to attach sessions to (skips the class name search)')
+    args = parser.parse_args()
+    
     print_header('🚀 COMPREHENSIVE TEST DATA POPULATION FOR INTELLIATTEND')
     print('\nThis script will populate:')
     print('  • Student profile data')
@@ -490,7 +551,10 @@ def main():
             print(f'\n⚠️  Skipping faculty creation: {e}')
         
         # Step 2: Populate attendance sessions and records
-        populate_attendance_sessions_and_records()
+        populate_attendance_sessions_and_records(
+            truncate=args.truncate, student_id=args.student_id, class_id=args.class_id,
+            force=args.force
+        )
         
         # Step 3: Verify all data
         verify_all_data()
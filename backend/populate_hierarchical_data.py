@@ -10,8 +10,18 @@ sys.path.append('.')
 from app import app, db
 from sqlalchemy import text
 import random
+from itertools import islice
 from datetime import datetime, timedelta
 
+# Rows per executemany call - keeps each multi-row INSERT well under max_allowed_packet
+SEED_BATCH_ROWS = 1000
+
+def chunked(seq, n):
+    """Yield successive lists of at most n items from seq"""
+    it = iter(seq)
+    while batch := list(islice(it, n)):
+        yield batch
+
 def populate_hierarchical_data():
     """Populate the hierarchical database with sample data"""
     
@@ -21,88 +31,59 @@ def populate_hierarchical_data():
             
             # 1. Get or create default college
             print("1. Getting/creating default college...")
-            check_college_sql = "SELECT id FROM colleges WHERE code = 'MRCET' LIMIT 1"
-            result = db.session.execute(text(check_college_sql)).fetchone()
-            
-            if not result:
-                insert_college_sql = """
-                INSERT INTO colleges (name, code, address, contact_info) 
-                VALUES ('Malla Reddy College of Engineering & Technology', 'MRCET', 
-                        'Maisammaguda, Dhulapally Post, Via Hakimpet, Secunderabad–500100', 
-                        'contact@mrcet.edu.in')
-                """
-                db.session.execute(text(insert_college_sql))
-                result = db.session.execute(text("SELECT LAST_INSERT_ID()")).fetchone()
-                college_id = result[0] if result else 1
-                print(f"   Created college with ID: {college_id}")
-            else:
-                college_id = result[0] if result else 1
-                print(f"   Using existing college with ID: {college_id}")
+            # Upsert on the unique code; LAST_INSERT_ID(id) makes lastrowid the
+            # existing id on a duplicate, so one statement replaces SELECT + INSERT + SELECT
+            upsert_college_sql = """
+            INSERT INTO colleges (name, code, address, contact_info) 
+            VALUES ('Malla Reddy College of Engineering & Technology', 'MRCET', 
+                    'Maisammaguda, Dhulapally Post, Via Hakimpet, Secunderabad–500100', 
+                    'contact@mrcet.edu.in')
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+            """
+            college_id = db.session.execute(text(upsert_college_sql)).lastrowid
+            print(f"   Using college with ID: {college_id}")
             
             # 2. Get or create default department
             print("2. Getting/creating default department...")
-            check_department_sql = "SELECT id FROM departments WHERE code = 'CSE' AND college_id = :college_id LIMIT 1"
-            result = db.session.execute(text(check_department_sql), {'college_id': college_id}).fetchone()
-            
-            if not result:
-                insert_department_sql = """
-                INSERT INTO departments (college_id, name, code, head) 
-                VALUES (:college_id, 'Computer Science and Engineering', 'CSE', 'Dr. Kanniaah')
-                """
-                db.session.execute(text(insert_department_sql), {'college_id': college_id})
-                result = db.session.execute(text("SELECT LAST_INSERT_ID()")).fetchone()
-                department_id = result[0] if result else 1
-                print(f"   Created department with ID: {department_id}")
-            else:
-                department_id = result[0] if result else 1
-                print(f"   Using existing department with ID: {department_id}")
+            upsert_department_sql = """
+            INSERT INTO departments (college_id, name, code, head) 
+            VALUES (:college_id, 'Computer Science and Engineering', 'CSE', 'Dr. Kanniaah')
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+            """
+            department_id = db.session.execute(text(upsert_department_sql), {'college_id': college_id}).lastrowid
+            print(f"   Using department with ID: {department_id}")
             
             # 3. Get or create default branch
             print("3. Getting/creating default branch...")
-            check_branch_sql = "SELECT id FROM branches WHERE code = 'B.Tech-CSE' AND department_id = :department_id LIMIT 1"
-            result = db.session.execute(text(check_branch_sql), {'department_id': department_id}).fetchone()
-            
-            if not result:
-                insert_branch_sql = """
-                INSERT INTO branches (department_id, name, code, degree_type, duration) 
-                VALUES (:department_id, 'B.Tech Computer Science and Engineering', 'B.Tech-CSE', 'B.Tech', 4)
-                """
-                db.session.execute(text(insert_branch_sql), {'department_id': department_id})
-                result = db.session.execute(text("SELECT LAST_INSERT_ID()")).fetchone()
-                branch_id = result[0] if result else 1
-                print(f"   Created branch with ID: {branch_id}")
-            else:
-                branch_id = result[0] if result else 1
-                print(f"   Using existing branch with ID: {branch_id}")
+            upsert_branch_sql = """
+            INSERT INTO branches (department_id, name, code, degree_type, duration) 
+            VALUES (:department_id, 'B.Tech Computer Science and Engineering', 'B.Tech-CSE', 'B.Tech', 4)
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+            """
+            branch_id = db.session.execute(text(upsert_branch_sql), {'department_id': department_id}).lastrowid
+            print(f"   Using branch with ID: {branch_id}")
             
             # 4. Get or create timetable
             print("4. Getting/creating timetable...")
-            check_timetable_sql = """
-            SELECT id FROM timetables WHERE branch_id = :branch_id AND academic_year = '2025-26' AND semester = 'Fall' LIMIT 1
+            # Relies on unique_branch_year_semester (migrations/add_hierarchy_unique_keys.sql)
+            upsert_timetable_sql = """
+            INSERT INTO timetables (branch_id, academic_year, semester) 
+            VALUES (:branch_id, '2025-26', 'Fall')
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
             """
-            result = db.session.execute(text(check_timetable_sql), {'branch_id': branch_id}).fetchone()
-            
-            if not result:
-                insert_timetable_sql = """
-                INSERT INTO timetables (branch_id, academic_year, semester) 
-                VALUES (:branch_id, '2025-26', 'Fall')
-                """
-                db.session.execute(text(insert_timetable_sql), {'branch_id': branch_id})
-                result = db.session.execute(text("SELECT LAST_INSERT_ID()")).fetchone()
-                timetable_id = result[0] if result else 1
-                print(f"   Created timetable with ID: {timetable_id}")
-            else:
-                timetable_id = result[0] if result else 1
-                print(f"   Using existing timetable with ID: {timetable_id}")
+            timetable_id = db.session.execute(text(upsert_timetable_sql), {'branch_id': branch_id}).lastrowid
+            print(f"   Using timetable with ID: {timetable_id}")
             
+            # Steps 5-7 seek on idx_branch_id / idx_department_id / idx_timetable_id
+            # (added by update_database_hierarchy.py) and share the single commit below;
+            # every matched row goes from NULL to a value, so rowcount is the rows changed
             # 5. Update existing students with branch_id if not set
             print("5. Updating students with branch_id...")
             update_students_sql = """
             UPDATE students SET branch_id = :branch_id WHERE branch_id IS NULL
             """
             result = db.session.execute(text(update_students_sql), {'branch_id': branch_id})
-            # Note: rowcount may not be available in all SQLAlchemy versions
-            print(f"   Updated students with branch_id")
+            print(f"   Updated {result.rowcount} students with branch_id")
             
             # 6. Update existing faculty with department_id if not set
             print("6. Updating faculty with department_id...")
@@ -110,8 +91,7 @@ def populate_hierarchical_data():
             UPDATE faculty SET department_id = :department_id WHERE department_id IS NULL
             """
             result = db.session.execute(text(update_faculty_sql), {'department_id': department_id})
-            # Note: rowcount may not be available in all SQLAlchemy versions
-            print(f"   Updated faculty with department_id")
+            print(f"   Updated {result.rowcount} faculty with department_id")
             
             # 7. Update existing classes with timetable_id if not set
             print("7. Updating classes with timetable_id...")
@@ -119,18 +99,22 @@ def populate_hierarchical_data():
             UPDATE classes SET timetable_id = :timetable_id WHERE timetable_id IS NULL
             """
             result = db.session.execute(text(update_classes_sql), {'timetable_id': timetable_id})
-            # Note: rowcount may not be available in all SQLAlchemy versions
-            print(f"   Updated classes with timetable_id")
+            print(f"   Updated {result.rowcount} classes with timetable_id")
             
             # 8. Populate schedules table with sample data if empty
             print("8. Populating schedules table...")
-            check_schedules_sql = "SELECT COUNT(*) as count FROM schedules"
+            # Existence probe - a COUNT(*) would scan the whole table on InnoDB
+            check_schedules_sql = "SELECT 1 FROM schedules LIMIT 1"
             result = db.session.execute(text(check_schedules_sql)).fetchone()
             
-            if result and result[0] == 0:
-                # Get all classes
-                get_classes_sql = "SELECT class_id, class_code FROM classes"
-                classes_result = db.session.execute(text(get_classes_sql)).fetchall()
+            if result is None:
+                # Page through classes by primary key instead of materializing them all
+                get_classes_sql = """
+                SELECT class_id FROM classes
+                WHERE class_id > :after_id
+                ORDER BY class_id
+                LIMIT :page_size
+                """
                 
                 # Sample schedule data
                 schedule_data = [
@@ -152,29 +136,39 @@ def populate_hierarchical_data():
                 """
                 
                 schedule_count = 0
-                for class_row in classes_result:
-                    class_id = class_row[0]
-                    class_code = class_row[1]
+                last_class_id = 0
+                while True:
+                    class_ids = db.session.execute(text(get_classes_sql), {
+                        'after_id': last_class_id,
+                        'page_size': SEED_BATCH_ROWS
+                    }).scalars().all()
+                    if not class_ids:
+                        break
+                    last_class_id = class_ids[-1]
                     
-                    # Insert 3-5 random schedules for each class
-                    num_schedules = random.randint(3, 5)
-                    selected_schedules = random.sample(schedule_data, min(num_schedules, len(schedule_data)))
+                    schedule_params = []
+                    for class_id in class_ids:
+                        # Insert 3-5 random schedules for each class
+                        num_schedules = random.randint(3, 5)
+                        selected_schedules = random.sample(schedule_data, min(num_schedules, len(schedule_data)))
+                        
+                        for sched in selected_schedules:
+                            schedule_params.append({
+                                'class_id': class_id,
+                                'day': sched['day'],
+                                'start_time': sched['start'],
+                                'end_time': sched['end'],
+                                'schedule_type': sched['type']
+                            })
                     
-                    for sched in selected_schedules:
-                        db.session.execute(text(insert_schedule_sql), {
-                            'class_id': class_id,
-                            'day': sched['day'],
-                            'start_time': sched['start'],
-                            'end_time': sched['end'],
-                            'schedule_type': sched['type']
-                        })
-                        schedule_count += 1
+                    # One executemany per page instead of one round trip per schedule row
+                    for batch in chunked(schedule_params, SEED_BATCH_ROWS):
+                        db.session.execute(text(insert_schedule_sql), batch)
+                    schedule_count += len(schedule_params)
                 
                 print(f"   Inserted {schedule_count} schedule entries")
-            elif result:
-                print(f"   Schedules table already contains {result[0]} entries")
             else:
-                print("   Could not determine schedule table count")
+                print("   Schedules table already populated")
             
             # 9. Create sample attendance sessions for the next week
             print("9. Creating sample attendance sessions...")
@@ -198,7 +192,7 @@ def populate_hierarchical_data():
                 VALUES (:class_id, :faculty_id, :session_date, :start_time, 'active')
                 """
                 
-                session_count = 0
+                session_params = []
                 for class_row in classes_for_sessions:
                     class_id, class_name, faculty_id = class_row
                     
@@ -207,15 +201,17 @@ def populate_hierarchical_data():
                         session_date = datetime.now() + timedelta(days=i)
                         start_time = session_date.replace(hour=9, minute=0, second=0)
                         
-                        db.session.execute(text(insert_session_sql), {
+                        session_params.append({
                             'class_id': class_id,
                             'faculty_id': faculty_id,
                             'session_date': session_date.date(),
                             'start_time': start_time
                         })
-                        session_count += 1
                 
-                print(f"   Created {session_count} attendance sessions")
+                for batch in chunked(session_params, SEED_BATCH_ROWS):
+                    db.session.execute(text(insert_session_sql), batch)
+                
+                print(f"   Created {len(session_params)} attendance sessions")
             else:
                 print("   No new attendance sessions needed")
             
@@ -8,7 +8,7 @@ import os
 sys.path.append('.')
 
 from app import app, db
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 
 def populate_mrcet_data():
     """Populate the MRCET database with initial data"""
@@ -19,22 +19,15 @@ def populate_mrcet_data():
             
             # 1. Create or get college
             print("1. Creating/updating college...")
-            check_college_sql = "SELECT id FROM colleges WHERE code = 'MRCET' LIMIT 1"
-            result = db.session.execute(text(check_college_sql)).fetchone()
-            
-            if not result:
-                insert_college_sql = """
-                INSERT INTO colleges (name, code, address) 
-                VALUES ('Malla Reddy College of Engineering & Technology', 'MRCET', 
-                        'Maisammaguda, Dhulapally Post, Via Hakimpet, Secunderabad–500100')
-                """
-                db.session.execute(text(insert_college_sql))
-                result = db.session.execute(text("SELECT LAST_INSERT_ID()")).fetchone()
-                college_id = result[0] if result else 1
-                print(f"   Created college with ID: {college_id}")
-            else:
-                college_id = result[0] if result else 1
-                print(f"   Using existing college with ID: {college_id}")
+            # Upsert on the unique code; LAST_INSERT_ID(id) makes lastrowid the existing id on a duplicate
+            upsert_college_sql = """
+            INSERT INTO colleges (name, code, address) 
+            VALUES ('Malla Reddy College of Engineering & Technology', 'MRCET', 
+                    'Maisammaguda, Dhulapally Post, Via Hakimpet, Secunderabad–500100')
+            ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+            """
+            college_id = db.session.execute(text(upsert_college_sql)).lastrowid
+            print(f"   Using college with ID: {college_id}")
             
             # 2. Populate departments
             print("2. Populating departments...")
@@ -59,24 +52,29 @@ def populate_mrcet_data():
                 "IT": "35", "ECE": "32", "EEE": "33", "MECH": "34", "AERO": "36", "CIVIL": "37", "H&S": "38"
             }
             
+            # One lookup for all existing codes, then a single executemany for the rest
+            check_dept_sql = text(
+                "SELECT code FROM departments WHERE college_id = :college_id AND code IN :codes"
+            ).bindparams(bindparam('codes', expanding=True))
+            existing_depts = {row[0] for row in db.session.execute(check_dept_sql, {
+                'college_id': college_id,
+                'codes': [dept['code'] for dept in departments_data]
+            })}
+            
+            new_depts = []
             for dept in departments_data:
-                check_dept_sql = "SELECT id FROM departments WHERE code = :code AND college_id = :college_id LIMIT 1"
-                result = db.session.execute(text(check_dept_sql), {'code': dept['code'], 'college_id': college_id}).fetchone()
-                
-                if not result:
-                    insert_dept_sql = """
-                    INSERT INTO departments (college_id, name, code, head)
-                    VALUES (:college_id, :name, :code, :head)
-                    """
-                    db.session.execute(text(insert_dept_sql), {
-                        'college_id': college_id,
-                        'name': dept['name'],
-                        'code': dept['code'],
-                        'head': dept['head']
-                    })
-                    print(f"   Created department: {dept['name']}")
-                else:
+                if dept['code'] in existing_depts:
                     print(f"   Department already exists: {dept['name']}")
+                else:
+                    new_depts.append({'college_id': college_id, **dept})
+                    print(f"   Created department: {dept['name']}")
+            
+            if new_depts:
+                insert_dept_sql = """
+                INSERT INTO departments (college_id, name, code, head)
+                VALUES (:college_id, :name, :code, :head)
+                """
+                db.session.execute(text(insert_dept_sql), new_depts)
             
             # 3. Create sample courses
             print("3. Creating sample courses...")
@@ -91,19 +89,27 @@ def populate_mrcet_data():
                 {"name": "Software Engineering Lab", "code": "R22A0515", "credits": 2, "course_type": "Lab"}
             ]
             
+            check_course_sql = text(
+                "SELECT code FROM courses WHERE code IN :codes"
+            ).bindparams(bindparam('codes', expanding=True))
+            existing_courses = {row[0] for row in db.session.execute(check_course_sql, {
+                'codes': [course['code'] for course in courses_data]
+            })}
+            
+            new_courses = []
             for course in courses_data:
-                check_course_sql = "SELECT id FROM courses WHERE code = :code LIMIT 1"
-                result = db.session.execute(text(check_course_sql), {'code': course['code']}).fetchone()
-                
-                if not result:
-                    insert_course_sql = """
-                    INSERT INTO courses (name, code, credits, course_type)
-                    VALUES (:name, :code, :credits, :course_type)
-                    """
-                    db.session.execute(text(insert_course_sql), course)
-                    print(f"   Created course: {course['name']}")
-                else:
+                if course['code'] in existing_courses:
                     print(f"   Course already exists: {course['name']}")
+                else:
+                    new_courses.append(course)
+                    print(f"   Created course: {course['name']}")
+            
+            if new_courses:
+                insert_course_sql = """
+                INSERT INTO courses (name, code, credits, course_type)
+                VALUES (:name, :code, :credits, :course_type)
+                """
+                db.session.execute(text(insert_course_sql), new_courses)
             
             # 4. Create sample rooms
             print("4. Creating sample rooms...")
@@ -134,19 +140,27 @@ def populate_mrcet_data():
                 {"room_number": "1102", "room_type": "Seminar Hall", "floor_number": 1, "capacity": 100, "building_name": "Main Building"}
             ]
             
+            check_room_sql = text(
+                "SELECT room_number FROM rooms WHERE room_number IN :room_numbers"
+            ).bindparams(bindparam('room_numbers', expanding=True))
+            existing_rooms = {row[0] for row in db.session.execute(check_room_sql, {
+                'room_numbers': [room['room_number'] for room in rooms_data]
+            })}
+            
+            new_rooms = []
             for room in rooms_data:
-                check_room_sql = "SELECT id FROM rooms WHERE room_number = :room_number LIMIT 1"
-                result = db.session.execute(text(check_room_sql), {'room_number': room['room_number']}).fetchone()
-                
-                if not result:
-                    insert_room_sql = """
-                    INSERT INTO rooms (room_number, room_type, floor_number, capacity, building_name)
-                    VALUES (:room_number, :room_type, :floor_number, :capacity, :building_name)
-                    """
-                    db.session.execute(text(insert_room_sql), room)
-                    print(f"   Created room: {room['room_number']}")
-                else:
+                if room['room_number'] in existing_rooms:
                     print(f"   Room already exists: {room['room_number']}")
+                else:
+                    new_rooms.append(room)
+                    print(f"   Created room: {room['room_number']}")
+            
+            if new_rooms:
+                insert_room_sql = """
+                INSERT INTO rooms (room_number, room_type, floor_number, capacity, building_name)
+                VALUES (:room_number, :room_type, :floor_number, :capacity, :building_name)
+                """
+                db.session.execute(text(insert_room_sql), new_rooms)
             
             # 5. Create academic calendar for 2024-25
             print("5. Creating academic calendar...")
@@ -176,26 +190,30 @@ def populate_mrcet_data():
                 {"academic_calendar_id": calendar_id, "semester_name": "End Semester Exams", "start_date": "2025-04-14", "end_date": "2025-04-26", "spell": "II Spell"}
             ]
             
+            # All semesters share calendar_id, so the (calendar, name) key reduces to name
+            check_semester_sql = text("""
+                SELECT semester_name FROM semesters 
+                WHERE academic_calendar_id = :academic_calendar_id AND semester_name IN :semester_names
+            """).bindparams(bindparam('semester_names', expanding=True))
+            existing_semesters = {row[0] for row in db.session.execute(check_semester_sql, {
+                'academic_calendar_id': calendar_id,
+                'semester_names': [semester['semester_name'] for semester in semesters_data]
+            })}
+            
+            new_semesters = []
             for semester in semesters_data:
-                check_semester_sql = """
-                SELECT id FROM semesters 
-                WHERE academic_calendar_id = :academic_calendar_id AND semester_name = :semester_name 
-                LIMIT 1
-                """
-                result = db.session.execute(text(check_semester_sql), {
-                    'academic_calendar_id': semester['academic_calendar_id'],
-                    'semester_name': semester['semester_name']
-                }).fetchone()
-                
-                if not result:
-                    insert_semester_sql = """
-                    INSERT INTO semesters (academic_calendar_id, semester_name, start_date, end_date, spell)
-                    VALUES (:academic_calendar_id, :semester_name, :start_date, :end_date, :spell)
-                    """
-                    db.session.execute(text(insert_semester_sql), semester)
-                    print(f"   Created semester: {semester['semester_name']}")
-                else:
+                if semester['semester_name'] in existing_semesters:
                     print(f"   Semester already exists: {semester['semester_name']}")
+                else:
+                    new_semesters.append(semester)
+                    print(f"   Created semester: {semester['semester_name']}")
+            
+            if new_semesters:
+                insert_semester_sql = """
+                INSERT INTO semesters (academic_calendar_id, semester_name, start_date, end_date, spell)
+                VALUES (:academic_calendar_id, :semester_name, :start_date, :end_date, :spell)
+                """
+                db.session.execute(text(insert_semester_sql), new_semesters)
             
             db.session.commit()
             print("✅ MRCET data population completed successfully!")
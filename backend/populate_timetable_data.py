@@ -147,7 +147,7 @@ def populate_timetable():
             VALUES (:section_id, :day_of_week, :slot_number, :slot_type, :start_time, :end_time, :subject_code, :subject_name, :faculty_name, :room_number)
             """
             
-            total_entries = 0
+            timetable_entries = []
             
             for section, data in timetable_data.items():
                 section_id = sections_dict.get(section)
@@ -175,7 +175,7 @@ def populate_timetable():
                         # Get slot number (if it's a break, use the slot name as slot number)
                         slot_number = slot["slot"] if isinstance(slot["slot"], int) else None
                         
-                        timetable_entry = {
+                        timetable_entries.append({
                             "section_id": section_id,
                             "day_of_week": day,
                             "slot_number": slot_number,
@@ -186,13 +186,14 @@ def populate_timetable():
                             "subject_name": slot["subject_full"],
                             "faculty_name": None,  # Will be populated from subjects table
                             "room_number": room_number
-                        }
-                        
-                        db.session.execute(text(insert_sql), timetable_entry)
-                        total_entries += 1
+                        })
+            
+            # One executemany for every section's slots
+            if timetable_entries:
+                db.session.execute(text(insert_sql), timetable_entries)
             
             db.session.commit()
-            print(f"✅ Timetable data populated successfully with {total_entries} entries!")
+            print(f"✅ Timetable data populated successfully with {len(timetable_entries)} entries!")
             
         except Exception as e:
             db.session.rollback()
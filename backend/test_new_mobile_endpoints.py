@@ -3,10 +3,24 @@
 Test script for new mobile API endpoints
 """
 
+import os
+import sys
 import requests
 import json
 from datetime import datetime
 
+# Per-request SQL budget of the WiFi endpoints (mirrors @query_budget in mobile_api.py)
+WIFI_QUERY_BUDGET = 3
+
+def check_query_count(response, label, budget):
+    """Fail when a response's X-Query-Count (set by the dev/test query counter) exceeds budget"""
+    query_count = response.headers.get('X-Query-Count')
+    if query_count is None:
+        print(f"⚠️  {label}: no X-Query-Count header (QUERY_COUNT_CHECK disabled?)")
+        return
+    assert int(query_count) <= budget, f"{label} issued {query_count} SQL queries (budget {budget})"
+    print(f"✅ {label} within query budget ({query_count}/{budget})")
+
 def test_new_mobile_endpoints():
     """Test the new mobile API endpoints"""
     
@@ -150,12 +164,13 @@ def test_new_mobile_endpoints():
     # Test 8: Test security violation logging
     print("\nTesting security violation logging...")
     violation_data = {
-        "type": "test_violation",
+        "type": "screenshot",
         "details": "Test security violation report"
     }
     try:
         response = requests.post(f"{base_url}/api/mobile/security/violation", headers=headers, json=violation_data)
-        if response.status_code == 200:
+        # 202 = queued for the batch writer, 200 = written synchronously (buffer full)
+        if response.status_code in (200, 202):
             result = response.json()
             if result.get('success'):
                 print("✅ Security violation logging endpoint working")
@@ -163,10 +178,40 @@ def test_new_mobile_endpoints():
                 print(f"⚠️  Security violation logging returned success=False")
         else:
             print(f"❌ Security violation logging failed with status code: {response.status_code}")
+        
+        # Unknown types must be rejected up front, not queued and dropped by the writer
+        response = requests.post(f"{base_url}/api/mobile/security/violation", headers=headers,
+                                 json={"type": "test_violation", "details": "Invalid violation type"})
+        if response.status_code == 400:
+            print("✅ Invalid security violation type rejected")
+        else:
+            print(f"❌ Invalid security violation type returned status code: {response.status_code}")
     except Exception as e:
         print(f"❌ Error testing security violation logging: {e}")
     
-    # Test 9: Test mobile logout
+    # Test 9: WiFi endpoints stay within their SQL query budget
+    print("\nTesting WiFi endpoint query budgets...")
+    # Any seeded session works; an unknown id still exercises the session lookup path
+    wifi_session_id = int(os.environ.get('WIFI_TEST_SESSION_ID', 1))
+    query_budget_ok = True
+    try:
+        response = requests.post(f"{base_url}/api/mobile/attendance/validate-wifi", headers=headers, json={
+            "session_id": wifi_session_id,
+            "wifi": {"current_ssid": "MRCET-CSE", "current_bssid": "00:1A:2B:3C:4D:5E"}
+        })
+        print(f"   validate-wifi returned status code: {response.status_code}")
+        check_query_count(response, "POST /attendance/validate-wifi", WIFI_QUERY_BUDGET)
+        
+        response = requests.get(f"{base_url}/api/mobile/attendance/wifi-filter/{wifi_session_id}", headers=headers)
+        print(f"   wifi-filter returned status code: {response.status_code}")
+        check_query_count(response, "GET /attendance/wifi-filter", WIFI_QUERY_BUDGET)
+    except AssertionError as e:
+        query_budget_ok = False
+        print(f"❌ Query budget exceeded: {e}")
+    except Exception as e:
+        print(f"❌ Error testing WiFi endpoint query budgets: {e}")
+    
+    # Test 10: Test mobile logout
     print("\nTesting mobile logout...")
     logout_data = {
         "device_uuid": "test_device_123"
@@ -187,6 +232,9 @@ def test_new_mobile_endpoints():
     print("\n" + "=" * 60)
     print("NEW MOBILE API ENDPOINTS TEST COMPLETE")
     print("=" * 60)
+    
+    return query_budget_ok
 
 if __name__ == '__main__':
-    test_new_mobile_endpoints()
\ No newline at end of file
+    # Non-zero exit when an endpoint goes over its query budget
+    sys.exit(0 if test_new_mobile_endpoints() is not False else 1)
\ No newline at end of file
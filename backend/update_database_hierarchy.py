@@ -86,6 +86,7 @@ def update_database_hierarchy():
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 
                 FOREIGN KEY (branch_id) REFERENCES branches(id) ON DELETE CASCADE,
+                UNIQUE KEY unique_branch_year_semester (branch_id, academic_year, semester),
                 INDEX idx_branch_id (branch_id),
                 INDEX idx_academic_year (academic_year),
                 INDEX idx_semester (semester)
@@ -50,6 +50,16 @@ def upgrade_database():
             else:
                 print(f"Error adding notifications_enabled column: {e}")
         
+        # Add token_version column to students table if it doesn't exist
+        try:
+            cursor.execute("ALTER TABLE students ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+            print("Added token_version column to students table")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e).lower():
+                print("token_version column already exists in students table")
+            else:
+                print(f"Error adding token_version column: {e}")
+        
         # Create security_violations table if it doesn't exist
         try:
             cursor.execute("""
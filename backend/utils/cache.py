@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+IntelliAttend - Shared Cache Helpers
+Redis-backed JSON cache with an in-process fallback when REDIS_URL is not set
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shared Redis client - None when REDIS_URL is not configured
+redis_client = None
+if os.environ.get('REDIS_URL'):
+    try:
+        import redis
+        redis_client = redis.Redis.from_url(os.environ.get('REDIS_URL'), decode_responses=True)
+    except ImportError:
+        print("⚠️  redis package not available - using in-process cache")
+
+# In-process fallback: key -> (value, expires_at monotonic timestamp)
+LOCAL_CACHE_MAX_ENTRIES = 10000
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+
+def cache_get_json(key: str) -> Optional[Any]:
+    """
+    Get a cached JSON value
+
+    Args:
+        key: Cache key
+
+    Returns:
+        Decoded value, or None on a miss (in-process values are shared - do not mutate)
+    """
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(key)
+            return json.loads(cached) if cached is not None else None
+        except Exception as e:
+            logger.error(f"Redis cache get failed for {key}: {e}")
+            return None
+
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del _local_cache[key]
+            return None
+        return entry[0]
+
+
+def cache_set_json(key: str, value: Any, ttl: int) -> None:
+    """
+    Store a JSON-serializable value with a TTL
+
+    Args:
+        key: Cache key
+        value: JSON-serializable value
+        ttl: Time to live in seconds
+    """
+    if redis_client is not None:
+        try:
+            redis_client.set(key, json.dumps(value, default=str), ex=ttl)
+        except Exception as e:
+            logger.error(f"Redis cache set failed for {key}: {e}")
+        return
+
+    now = time.monotonic()
+    with _local_cache_lock:
+        if len(_local_cache) >= LOCAL_CACHE_MAX_ENTRIES:
+            expired = [k for k, v in _local_cache.items() if v[1] <= now]
+            for k in expired:
+                del _local_cache[k]
+            if len(_local_cache) >= LOCAL_CACHE_MAX_ENTRIES:
+                _local_cache.clear()
+        _local_cache[key] = (value, now + ttl)
+
+
+def cache_delete(*keys: str) -> None:
+    """
+    Remove one or more keys from the cache
+
+    Args:
+        keys: Cache keys to invalidate
+    """
+    if not keys:
+        return
+
+    if redis_client is not None:
+        try:
+            redis_client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Redis cache delete failed for {keys}: {e}")
+        return
+
+    with _local_cache_lock:
+        for key in keys:
+            _local_cache.pop(key, None)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+IntelliAttend - orjson JSON Provider
+Drop-in replacement for Flask's default JSON provider backed by orjson
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Non-string dict keys and numpy values are accepted like the stdlib encoder's callers expect
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes/decodes with orjson.
+    Types orjson does not know (Decimal, UUID, dataclasses, ...) fall back to
+    DefaultJSONProvider.default; datetimes are emitted as ISO 8601.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+IntelliAttend - Per-request SQL Query Counter
+Development/testing guard that flags endpoints exceeding their query budget (N+1 regressions)
+"""
+
+import logging
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(max_queries: int):
+    """
+    Declare the maximum number of SQL statements a view may issue per request
+
+    Args:
+        max_queries: Upper bound checked by the query counter when it is installed
+    """
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def install_query_counter(flask_app):
+    """
+    Count SQL statements per request and check them against each view's budget.
+    Adds an X-Query-Count response header; over-budget requests are logged, and
+    raise under TESTING so the calling test fails.
+
+    Args:
+        flask_app: Flask application
+    """
+    event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @flask_app.after_request
+    def check_query_budget(response):
+        count = g.get('query_count', 0)
+        response.headers['X-Query-Count'] = str(count)
+
+        view = flask_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint} issued {count} SQL queries (budget {budget})"
+            if flask_app.testing:
+                raise AssertionError(message)
+            logger.warning(message)
+
+        return response
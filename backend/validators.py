@@ -86,6 +86,9 @@ def validate_mac_address(mac: str) -> Tuple[bool, Optional[str]]:
     if not mac:
         return False, "MAC address is required"
     
+    if not isinstance(mac, str):
+        return False, "MAC address must be a string"
+    
     # Pattern for MAC address (supports : or - separators)
     pattern = r'^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$'
     
@@ -445,6 +448,61 @@ def validate_department(department: str) -> Tuple[bool, Optional[str]]:
     return True, None
 
 
+# ============================================================================
+# MOBILE DEVICE PAYLOAD VALIDATION
+# ============================================================================
+
+# (field, default, max_length) - lengths mirror the student_devices columns
+DEVICE_INFO_FIELDS = (
+    ('device_id', None, 255),
+    ('device_name', 'Unknown Device', 100),
+    ('device_type', 'android', None),
+    ('device_model', None, 100),
+    ('os_version', None, 50),
+    ('app_version', None, 20),
+)
+
+DEVICE_TYPES = frozenset(('android', 'ios', 'web'))
+
+
+def parse_device_info(device_info: dict) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Parse and validate the device_info block sent by the mobile app
+    Fills defaults in a single pass so handlers can index fields directly
+    
+    Args:
+        device_info: Raw device_info dictionary from the request body
+        
+    Returns:
+        Tuple of (parsed: Optional[dict], error_message: Optional[str])
+    """
+    if device_info is None:
+        device_info = {}
+    
+    if not isinstance(device_info, dict):
+        return None, "device_info must be an object"
+    
+    parsed = {}
+    for field, default, max_length in DEVICE_INFO_FIELDS:
+        value = device_info.get(field)
+        if value is None:
+            parsed[field] = default
+            continue
+        
+        if not isinstance(value, str):
+            return None, f"device_info.{field} must be a string"
+        
+        if max_length and len(value) > max_length:
+            return None, f"device_info.{field} cannot exceed {max_length} characters"
+        
+        parsed[field] = value
+    
+    if parsed['device_type'] not in DEVICE_TYPES:
+        return None, f"device_info.device_type must be one of: {', '.join(sorted(DEVICE_TYPES))}"
+    
+    return parsed, None
+
+
 # ============================================================================
 # COMPOSITE VALIDATION
 # ============================================================================
@@ -16,6 +16,7 @@ CREATE TABLE IF NOT EXISTS faculty (
     faculty_code VARCHAR(20) UNIQUE NOT NULL,
     first_name VARCHAR(50) NOT NULL,
     last_name VARCHAR(50) NOT NULL,
+    full_name VARCHAR(101) GENERATED ALWAYS AS (TRIM(CONCAT_WS(' ', first_name, last_name))) STORED,
     email VARCHAR(100) UNIQUE NOT NULL,
     phone_number VARCHAR(15) UNIQUE NOT NULL,
     department VARCHAR(100) NOT NULL,
@@ -43,6 +44,7 @@ CREATE TABLE IF NOT EXISTS students (
     program VARCHAR(100) NOT NULL,
     password_hash VARCHAR(255) NOT NULL,
     is_active BOOLEAN DEFAULT TRUE,
+    token_version INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
@@ -154,7 +156,8 @@ CREATE TABLE IF NOT EXISTS attendance_sessions (
     INDEX idx_faculty_id (faculty_id),
     INDEX idx_session_date (session_date),
     INDEX idx_qr_token (qr_token),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_class_session_date (class_id, session_date)
 );
 
 -- ============================================================================
@@ -187,7 +190,8 @@ CREATE TABLE IF NOT EXISTS attendance_records (
     INDEX idx_student_id (student_id),
     INDEX idx_scan_timestamp (scan_timestamp),
     INDEX idx_status (status),
-    INDEX idx_verification_score (verification_score)
+    INDEX idx_verification_score (verification_score),
+    INDEX idx_student_scan_status (student_id, scan_timestamp, status)
 );
 
 -- ============================================================================
@@ -234,6 +238,7 @@ CREATE TABLE IF NOT EXISTS student_devices (
     biometric_enabled BOOLEAN DEFAULT FALSE,
     location_permission BOOLEAN DEFAULT FALSE,
     bluetooth_permission BOOLEAN DEFAULT FALSE,
+    notifications_enabled BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
@@ -242,7 +247,9 @@ CREATE TABLE IF NOT EXISTS student_devices (
     INDEX idx_student_id (student_id),
     INDEX idx_device_uuid (device_uuid),
     INDEX idx_device_type (device_type),
-    INDEX idx_last_seen (last_seen)
+    INDEX idx_last_seen (last_seen),
+    INDEX idx_student_device_uuid (student_id, device_uuid),
+    INDEX idx_student_last_seen (student_id, last_seen)
 );
 
 -- ============================================================================
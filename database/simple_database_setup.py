@@ -64,6 +64,7 @@ def create_simple_database():
                 program VARCHAR(100) NOT NULL,
                 password_hash VARCHAR(255) NOT NULL,
                 is_active BOOLEAN DEFAULT TRUE,
+                token_version INT NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
             )